@@ -0,0 +1,216 @@
+import os
+import re
+import sys
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+
+from tracing import tracer
+from json_codec import dumps
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")            # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# Per-event sampling for chatty events, e.g. "upstream_response=0.1,user_authenticated=0.25"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# User text (prompts, messages) is logged as its length unless this is set
+LOG_USER_TEXT = os.getenv("LOG_USER_TEXT", "").lower() in ("1", "true", "yes")
+
+ROOT_LOGGER = "pcp"
+SECRET_FIELDS = {"password", "password_hash", "token", "access_token", "refresh_token",
+                 "authorization", "api_key", "secret", "cookie"}
+USER_TEXT_FIELDS = {"prompt", "content", "message", "reply"}
+SECRET_PATTERNS = (
+    re.compile(r"(Bearer\s+)\S+"),
+    re.compile(r"\b(sk-or-v1-|sk-)[A-Za-z0-9_-]+"),
+    re.compile(r"\b(hf_)[A-Za-z0-9]+"),
+    re.compile(r"\b(eyJ)[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"),  # JWTs
+)
+
+
+def scrub(text):
+    """Mask API keys, bearer tokens and JWTs inside free text"""
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(lambda m: m.group(1) + "[redacted]", text)
+    return text
+
+
+def redact(fields):
+    """Copy of `fields` safe to log: secrets masked, user text reduced to its length"""
+    out = {}
+    for key, value in fields.items():
+        name = key.lower()
+        if name in SECRET_FIELDS:
+            out[key] = "[redacted]"
+        elif name in USER_TEXT_FIELDS and not LOG_USER_TEXT:
+            out[key + "_chars"] = len(value) if isinstance(value, str) else None
+        elif isinstance(value, str):
+            out[key] = scrub(value)
+        else:
+            out[key] = value
+    return out
+
+
+def parse_sample_rates(spec):
+    """"event=rate,..." -> {event: rate}"""
+    rates = {}
+    for part in (spec or "").split(","):
+        event, _, rate = part.partition("=")
+        try:
+            rates[event.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of each high-volume event; warnings and errors are always kept"""
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.msg, 1.0)
+        record.sample_rate = rate
+        return record.levelno >= logging.WARNING or rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread; when the queue is full they are dropped and
+    counted instead of blocking the request thread"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread; only resolve %-args and exception text here
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the event's fields redacted"""
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": scrub(str(record.msg)),
+        }
+        if getattr(record, "trace_id", None):
+            data["trace_id"] = record.trace_id
+        data.update(redact(getattr(record, "fields", {})))
+        if getattr(record, "sample_rate", 1.0) < 1.0:
+            data["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            data["exc"] = scrub(record.exc_text)
+        return dumps(data, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable variant for local development"""
+    def format(self, record):
+        fields = " ".join(f"{k}={v}" for k, v in redact(getattr(record, "fields", {})).items())
+        line = f"{datetime.fromtimestamp(record.created).strftime('%H:%M:%S.%f')[:-3]} " \
+               f"{record.levelname:7s} {scrub(str(record.msg))} {fields}".rstrip()
+        if record.exc_text:
+            line += "\n" + scrub(record.exc_text)
+        return line
+
+
+class Logger:
+    """Structured logger: log.info("event_name", key=value, ...)"""
+    def __init__(self, name):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level, event, fields, exc_info=False):
+        if self.logger.isEnabledFor(level):
+            # The trace id is read here, on the calling thread, so the event joins its request
+            self.logger.log(level, event, extra={"fields": fields, "trace_id": tracer.current_trace_id()},
+                            exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+class LogPipeline:
+    """Queue-backed logging for the app's loggers: callers only enqueue, and a single
+    thread formats and writes to stdout, so a slow stdout pipe never stalls a worker"""
+    def __init__(self, stream=None, level=LOG_LEVEL, fmt=LOG_FORMAT, queue_size=LOG_QUEUE_SIZE,
+                 sample_rates=LOG_SAMPLE_RATES):
+        self.stream = stream or sys.stdout
+        self.level = level
+        self.fmt = fmt
+        self.queue_size = queue_size
+        self.sample_rates = parse_sample_rates(sample_rates)
+        self.handler = None
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.handler is not None:
+                return
+            output = logging.StreamHandler(self.stream)
+            output.setFormatter(TextFormatter() if self.fmt == "text" else JsonFormatter())
+            self.handler = DroppingQueueHandler(queue.Queue(self.queue_size))
+            self.handler.addFilter(SamplingFilter(self.sample_rates))
+            root = logging.getLogger(ROOT_LOGGER)
+            root.setLevel(self.level)
+            root.addHandler(self.handler)
+            root.propagate = False
+            self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+            self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Flush what is queued and stop the writer thread"""
+        with self.lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def stats(self):
+        return {
+            "queued": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0,
+        }
+
+    def get_logger(self, name):
+        self.start()
+        return Logger(f"{ROOT_LOGGER}.{name}")
+
+
+# Create global instance
+
+log_pipeline = LogPipeline()
+
+
+def get_logger(name):
+    return log_pipeline.get_logger(name)
@@ -0,0 +1,103 @@
+"""Build step for static CSS: drop rules for classes/ids the pages never use, then minify.
+
+AssetStore runs this when it loads static/, so the browser gets a small precompiled
+stylesheet instead of compiling Tailwind at runtime. It can also be run by hand to emit
+the purged files, e.g. for upload to a CDN:
+
+    python asset_pipeline.py static dist
+"""
+import os
+import re
+import sys
+
+COMMENT = re.compile(r"/\*.*?\*/", re.S)
+SELECTOR_NAMES = re.compile(r"[.#](-?[_a-zA-Z][\w-]*)")
+WORD = re.compile(r"[\w-]+")
+# At-rules whose body is more rules (purged recursively) vs. opaque blocks kept as-is
+NESTED_AT_RULES = ("@media", "@supports")
+
+
+def used_names(sources):
+    """Every word-like token in the HTML/JS sources; a class or id not here is unused"""
+    names = set()
+    for text in sources:
+        names.update(WORD.findall(text))
+    return names
+
+
+def split_blocks(css):
+    """Top-level (prelude, body) pairs of a stylesheet"""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = ""
+    for i, ch in enumerate(css):
+        if ch == "{":
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:i]))
+                start = i + 1
+    return blocks
+
+
+def purge(css, names):
+    """Rules of `css` whose selectors only reference classes/ids found in `names`"""
+    out = []
+    for prelude, body in split_blocks(COMMENT.sub("", css)):
+        if prelude.startswith(NESTED_AT_RULES):
+            inner = purge(body, names)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            out.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [s.strip() for s in prelude.split(",")]
+            kept = [s for s in selectors if all(n in names for n in SELECTOR_NAMES.findall(s))]
+            if kept:
+                out.append(f"{','.join(kept)}{{{body}}}")
+    return minify("".join(out))
+
+
+def minify(css):
+    css = re.sub(r"\s+", " ", COMMENT.sub("", css))
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def build_css(css, sources):
+    """Purged, minified stylesheet for pages made of `sources`"""
+    return purge(css, used_names(sources))
+
+
+def build_directory(src, dest):
+    """Write purged copies of every .css file in `src` to `dest`"""
+    sources = []
+    stylesheets = []
+    for root, _, files in os.walk(src):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if filename.endswith((".html", ".js")):
+                with open(path, encoding="utf-8") as f:
+                    sources.append(f.read())
+            elif filename.endswith(".css"):
+                stylesheets.append(path)
+    for path in stylesheets:
+        with open(path, encoding="utf-8") as f:
+            css = f.read()
+        built = build_css(css, sources)
+        target = os.path.join(dest, os.path.relpath(path, src))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(built)
+        print(f"{path}: {len(css)} -> {len(built)} bytes")
+
+
+if __name__ == "__main__":
+    build_directory(sys.argv[1] if len(sys.argv) > 1 else "static",
+                    sys.argv[2] if len(sys.argv) > 2 else "dist")
@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+from app_logging import get_logger
+from storage import storage_errors
+
+ALGORITHM = "HS256"
+ACCESS_TTL = int(os.getenv("JWT_ACCESS_TTL", 15 * 60))
+REFRESH_TTL = int(os.getenv("JWT_REFRESH_TTL", 24 * 3600))
+REMEMBER_REFRESH_TTL = int(os.getenv("JWT_REMEMBER_REFRESH_TTL", 30 * 24 * 3600))
+# Seconds a rotated refresh token may still be presented by a request that raced the
+# rotation (parallel requests from one browser); later use counts as theft
+REUSE_GRACE = float(os.getenv("JWT_REUSE_GRACE", 10))
+ACCESS_COOKIE = "access_token"
+REFRESH_COOKIE = "refresh_token"
+# Tolerated clock drift between nodes, in seconds
+LEEWAY = 10
+# Verified tokens remembered so repeat requests skip the HMAC check
+VERIFY_CACHE_SIZE = 4096
+# One row per issued refresh token: jti, family, user_id, expires_at, used, used_at (schema.sql)
+REFRESH_TABLE = "refresh_tokens"
+
+log = get_logger("auth_tokens")
+
+
+def load_keys():
+    """Signing keys from JWT_KEYS='kid1:secret1,kid2:secret2'.
+
+    The first key signs new tokens; the rest only verify, so a key can be rotated out by
+    prepending a new one and dropping the old one once its tokens have expired. Returns an
+    empty list when unset: tokens then need a dedicated key, never the session secret.
+    """
+    keys = []
+    for part in (os.getenv("JWT_KEYS") or "").split(","):
+        if ":" in part:
+            kid, secret = part.split(":", 1)
+            if kid.strip() and secret.strip():
+                keys.append((kid.strip(), secret.strip()))
+    return keys
+
+
+def parse_utc(value):
+    """Aware UTC datetime from a stored ISO timestamp; timestamptz columns come back with an
+    offset, the local store's without one"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+class TokenService:
+    """Issues and verifies short-lived access tokens and longer-lived refresh tokens.
+
+    Access tokens are verified in process. Refresh tokens are single use: each one is
+    recorded in REFRESH_TABLE with its jti and family (the chain of tokens rotated from one
+    login). Presenting a token that was already rotated revokes the whole family, as does
+    logout, so a stolen refresh token stops working once either party uses the chain.
+    """
+    def __init__(self, keys, get_client, access_ttl=ACCESS_TTL, refresh_ttl=REFRESH_TTL,
+                 remember_refresh_ttl=REMEMBER_REFRESH_TTL, reuse_grace=REUSE_GRACE):
+        self.keys = dict(keys)
+        self.signing_kid = keys[0][0] if keys else None
+        self.get_client = get_client
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.remember_refresh_ttl = remember_refresh_ttl
+        self.reuse_grace = reuse_grace
+        self.verified = {}
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    def _encode(self, claims, ttl):
+        if self.signing_kid is None:
+            raise RuntimeError("No JWT signing key configured; set JWT_KEYS")
+        now = int(time.time())
+        claims = dict(claims, iat=now, exp=now + ttl, jti=uuid.uuid4().hex)
+        return jwt.encode(claims, self.keys[self.signing_kid], algorithm=ALGORITHM,
+                          headers={"kid": self.signing_kid}), claims
+
+    def issue(self, user, remember=False, family=None):
+        """Access + refresh token pair for a user row with id, username and email.
+        A new login starts a new family; a refresh continues the old one."""
+        family = family or uuid.uuid4().hex
+        claims = {"sub": str(user["id"]), "uid": user["id"], "fam": family,
+                  "username": user.get("username"), "email": user.get("email")}
+        refresh_ttl = self.remember_refresh_ttl if remember else self.refresh_ttl
+        access_token, _ = self._encode(dict(claims, type="access"), self.access_ttl)
+        refresh_token, refresh_claims = self._encode(
+            dict(claims, type="refresh", remember=bool(remember)), refresh_ttl)
+        self.get_client().table(REFRESH_TABLE).insert({
+            "jti": refresh_claims["jti"],
+            "family": family,
+            "user_id": user["id"],
+            "expires_at": datetime.utcfromtimestamp(refresh_claims["exp"]).isoformat(),
+            "used": False,
+        }).execute()
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": self.access_ttl,
+            "refresh_expires_in": refresh_ttl,
+        }
+
+    def verify(self, token, token_type="access"):
+        """Claims of a valid, unexpired token of the given type, else None"""
+        claims = self.verified.get(token)
+        if claims is not None:
+            self.cache_stats["hits"] += 1
+            if claims["exp"] + LEEWAY > time.time() and claims.get("type") == token_type:
+                return claims
+            return None
+        self.cache_stats["misses"] += 1
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.keys.get(kid)
+            if key is None:
+                return None
+            claims = jwt.decode(token, key, algorithms=[ALGORITHM], leeway=LEEWAY)
+        except jwt.InvalidTokenError:
+            return None
+        if len(self.verified) >= VERIFY_CACHE_SIZE:
+            self.verified.clear()
+        self.verified[token] = claims
+        if claims.get("type") != token_type:
+            return None
+        return claims
+
+    def rotate(self, refresh_token):
+        """Spend a refresh token; returns (claims, new token pair).
+
+        (claims, None) means the token was rotated a moment ago by a concurrent request: the
+        caller is who they say, but gets no second pair. (None, None) means rejected; a token
+        reused after the grace period also revokes its family.
+        """
+        claims = self.verify(refresh_token, "refresh")
+        if claims is None or not claims.get("fam"):
+            return None, None
+        try:
+            table = self.get_client().table
+            now = datetime.now(timezone.utc)
+            # Compare-and-set on used, so of two racing requests only one rotates
+            spent = table(REFRESH_TABLE).update({"used": True, "used_at": now.isoformat()}).eq(
+                "jti", claims["jti"]).eq("used", False).execute()
+            if not spent.data:
+                rows = table(REFRESH_TABLE).select("used_at").eq("jti", claims["jti"]).execute().data
+                if not rows:
+                    return None, None  # revoked, or never issued by us
+                used_at = rows[0].get("used_at")
+                if used_at and now - parse_utc(used_at) <= timedelta(seconds=self.reuse_grace):
+                    return claims, None
+                log.warning("refresh_token_reused", user_id=claims["uid"], family=claims["fam"])
+                self.revoke_family(claims["fam"])
+                return None, None
+            user = {"id": claims["uid"], "username": claims.get("username"), "email": claims.get("email")}
+            return claims, self.issue(user, remember=claims.get("remember", False), family=claims["fam"])
+        except storage_errors() as e:
+            log.error("refresh_token_rotate_failed", error=str(e))
+            return None, None
+
+    def refresh(self, refresh_token):
+        """Exchange a refresh token for a new pair (the refresh token rotates too), else None"""
+        return self.rotate(refresh_token)[1]
+
+    def revoke_family(self, family):
+        """Invalidate every refresh token rotated from the same login"""
+        self.get_client().table(REFRESH_TABLE).delete().eq("family", family).execute()
+
+    def revoke(self, token, token_type="refresh"):
+        """Revoke the family of an access or refresh token, e.g. on logout; True if one was revoked"""
+        claims = self.verify(token, token_type) if token else None
+        if claims is None or not claims.get("fam"):
+            return False
+        try:
+            self.revoke_family(claims["fam"])
+        except Exception as e:
+            log.error("refresh_token_revoke_failed", error=str(e))
+            return False
+        return True
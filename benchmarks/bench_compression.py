@@ -0,0 +1,85 @@
+"""Bytes on the wire and CPU cost of compressing API responses, per encoding and level.
+
+Encodes /get_chat and /chats style payloads with json_codec, then compresses them with
+each available encoding (gzip always; br and zstd when brotli/zstandard are installed)
+at several levels. Message text is pseudo-random words unless --file points at a real
+chat_history.json, since repetitive synthetic text compresses unrealistically well.
+
+    python benchmarks/bench_compression.py --messages 100,1000,10000
+    python benchmarks/bench_compression.py --file chat_history.json
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from json_codec import dumpb, loads  # noqa: E402
+from response_compression import (  # noqa: E402
+    compress, available_encodings, DEFAULT_LEVELS, ENDPOINT_LEVELS, COMPRESS_MIN_BYTES)
+
+LEVELS = {"gzip": (1, 5, 6, 9), "br": (1, 4, 5, 8, 11), "zstd": (1, 3, 6, 12, 19)}
+
+
+def synthetic_messages(count, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(2000)]
+    return [{"role": "user" if i % 2 == 0 else "assistant",
+             "content": " ".join(rng.choice(words) for _ in range(rng.randint(5, 120)))} for i in range(count)]
+
+
+def synthetic_chat_list(count, seed=0):
+    rng = random.Random(seed)
+    return [{"chat_id": "%032x" % rng.getrandbits(128), "title": f"Chat about topic {rng.randint(1, 10**6)}",
+             "updated": 1.7e9 + rng.random() * 1e7} for _ in range(count)]
+
+
+def cpu_seconds(fn, rounds=5):
+    """Best per-call thread CPU time over `rounds` calls"""
+    best = None
+    for _ in range(rounds):
+        started = time.thread_time()
+        fn()
+        elapsed = time.thread_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", default="100,1000,10000", help="message counts for /get_chat payloads")
+    parser.add_argument("--chats", type=int, default=500, help="chats in the /chats payload")
+    parser.add_argument("--file", help="a chat_history.json whose largest chat is used instead")
+    args = parser.parse_args()
+
+    payloads = []
+    if args.file:
+        with open(args.file, "rb") as f:
+            history = loads(f.read())
+        largest = max(history.values(), key=lambda chat: len(chat.get("messages") or []))
+        payloads.append(("get_chat", f"{len(largest['messages'])} messages", largest["messages"][1:]))
+    else:
+        for count in (int(c) for c in args.messages.split(",")):
+            payloads.append(("get_chat", f"{count} messages", synthetic_messages(count)))
+    payloads.append(("list_chats", f"{args.chats} chats", synthetic_chat_list(args.chats)))
+
+    encodings = available_encodings()
+    print(f"encodings: {', '.join(encodings)}  (min size {COMPRESS_MIN_BYTES}B)")
+    for endpoint, label, payload in payloads:
+        body = dumpb(payload)
+        print(f"{endpoint} {label}: {len(body):,} bytes")
+        for encoding in encodings:
+            configured = ENDPOINT_LEVELS.get(endpoint, {}).get(encoding, DEFAULT_LEVELS[encoding])
+            for level in LEVELS[encoding]:
+                compressed = compress(body, encoding, level)
+                cpu = cpu_seconds(lambda: compress(body, encoding, level))
+                marker = "  <- configured" if level == configured else ""
+                print(f"  {encoding:5s} level {level:2d}  {len(compressed):>11,} bytes  ratio {len(body) / len(compressed):5.2f}  "
+                      f"cpu {cpu * 1000:8.3f}ms  {len(body) / max(cpu, 1e-9) / 1e6:7.1f}MB/s{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""JSON encode/decode throughput on conversation payloads.
+
+Compares the encoders the app has used: stdlib json with indent=2 (the old
+chat_history.json format), stdlib compact, Flask's default provider, and json_codec
+(orjson when installed). Payloads are a whole chat_history.json and the message list
+/get_chat returns for one chat, either synthetic or from a real file:
+
+    python benchmarks/bench_json.py --messages 100000
+    python benchmarks/bench_json.py --file chat_history.json
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_codec  # noqa: E402
+from json_codec import FastJSONProvider  # noqa: E402
+from microbench import conversations_with, MESSAGES_PER_CHAT  # noqa: E402
+
+
+def encoders():
+    app = Flask(__name__)
+    flask_default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    return {
+        "json indent=2": (lambda obj: json.dumps(obj, ensure_ascii=False, indent=2), json.loads),
+        "json compact": (lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")), json.loads),
+        "flask default": (lambda obj: flask_default.dumps(obj, separators=(",", ":")), flask_default.loads),
+        "json_codec": (json_codec.dumpb, json_codec.loads),
+        "flask json_codec": (fast.dumps, fast.loads),
+    }
+
+
+def throughput(fn, arg, size):
+    """MB/s of `size` bytes processed by fn(arg), best of 5 rounds"""
+    timer = timeit.Timer(lambda: fn(arg))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return size / best / 1e6, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="messages in the synthetic history")
+    parser.add_argument("--file", help="a chat_history.json to use instead of synthetic data")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            history = json.load(f)
+    else:
+        history = conversations_with(args.messages, max(1, args.messages // MESSAGES_PER_CHAT))
+    largest = max(history.values(), key=lambda chat: len(chat.get("messages") or []), default={})
+    payloads = {"chat_history": history, "get_chat": (largest.get("messages") or [])[1:]}
+
+    print(f"json_codec backend: {'orjson' if json_codec.orjson else 'stdlib json'}")
+    for name, payload in payloads.items():
+        print(f"{name}:")
+        for label, (encode, decode) in encoders().items():
+            encoded = encode(payload)
+            size = len(encoded if isinstance(encoded, bytes) else encoded.encode("utf-8"))
+            enc_rate, enc_s = throughput(encode, payload, size)
+            dec_rate, dec_s = throughput(decode, encoded, size)
+            print(f"  {label:18s} {size / 1e6:8.2f}MB  encode {enc_rate:8.1f}MB/s ({enc_s * 1000:8.2f}ms)  "
+                  f"decode {dec_rate:8.1f}MB/s ({dec_s * 1000:8.2f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Headless-browser page-load benchmark for /chat.
+
+Serves static/ through AssetStore with stub API routes, loads the page in headless Chromium
+and reports DOMContentLoaded, load, and time until the chat UI is ready (the 'chat-ready'
+performance mark), plus bytes transferred, for cold and warm (cached) loads.
+
+Runs offline: every request to a third-party host is answered from --vendor-dir (files
+matched by basename, e.g. marked.min.js) or with an empty body, and listed in the report.
+
+Needs Playwright and its Chromium build, which are not in requirements.txt, and, to load
+the page with its real scripts, the CDN files it uses saved in benchmarks/vendor:
+
+    pip install playwright && playwright install chromium
+    mkdir -p benchmarks/vendor && curl -Lo benchmarks/vendor/marked.min.js \\
+        https://cdn.jsdelivr.net/npm/marked/marked.min.js
+    python benchmarks/bench_page_load.py --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, jsonify, request  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from static_assets import AssetStore  # noqa: E402
+
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    sync_playwright = None
+
+CONTENT_TYPES = {".js": "application/javascript", ".css": "text/css"}
+VENDOR_DIR = os.path.join(ROOT, "benchmarks", "vendor")
+
+TIMINGS_JS = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const ready = performance.getEntriesByName('chat-ready')[0];
+    const resources = performance.getEntriesByType('resource');
+    return {
+        dom_content_loaded: nav.domContentLoadedEventEnd,
+        load: nav.loadEventEnd,
+        ready: ready ? ready.startTime : null,
+        transferred: nav.transferSize + resources.reduce((sum, r) => sum + (r.transferSize || 0), 0),
+        requests: resources.length + 1,
+    };
+}"""
+
+
+DEFAULT_CHATS = [{"chat_id": "bench", "title": "Benchmark chat", "updated": 1}]
+DEFAULT_MESSAGES = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "**hi** there"}]
+
+
+def page(items, start, end):
+    """A slice of `items` shaped like the paginated app APIs (X-Total-Count header)"""
+    response = jsonify(items[start:end])
+    response.headers["X-Total-Count"] = str(len(items))
+    return response
+
+
+def make_app(chat_list=DEFAULT_CHATS, messages=DEFAULT_MESSAGES):
+    """The chat page and assets, with canned responses for the APIs it calls on load"""
+    app = Flask(__name__)
+    store = AssetStore(os.path.join(ROOT, "static")).load()
+
+    @app.route("/chat")
+    def chat_page():
+        return store.response("chat.html")
+
+    @app.route("/assets/<version>/<path:name>")
+    def asset(version, name):
+        return store.response(name, version)
+
+    @app.route("/user-info")
+    def user_info():
+        return jsonify({"username": "bench", "email": "bench@example.com"})
+
+    @app.route("/chats")
+    def chats():
+        offset = request.args.get("offset", 0, type=int)
+        return page(chat_list, offset, offset + request.args.get("limit", len(chat_list), type=int))
+
+    @app.route("/get_chat/<chat_id>")
+    def get_chat(chat_id):
+        end = min(request.args.get("before", len(messages), type=int), len(messages))
+        return page(messages, max(0, end - request.args.get("limit", end, type=int)), end)
+
+    @app.route("/new_chat", methods=["POST"])
+    def new_chat():
+        return jsonify({"chat_id": "bench"})
+
+    return app
+
+
+def third_party_route(vendor_dir, seen):
+    """Playwright route handler that lets requests to the local server through and answers
+    third-party ones from vendor_dir (by basename) or with an empty body, recording which in `seen`"""
+    def route(r):
+        host = urlparse(r.request.url).hostname
+        if host in ("127.0.0.1", "localhost"):
+            return r.continue_()
+        name = os.path.basename(urlparse(r.request.url).path)
+        path = os.path.join(vendor_dir, name)
+        vendored = os.path.isfile(path)
+        seen[r.request.url] = "vendored" if vendored else "stubbed"
+        body = open(path, "rb").read() if vendored else b""
+        r.fulfill(status=200, body=body, content_type=CONTENT_TYPES.get(os.path.splitext(name)[1], "text/plain"))
+    return route
+
+
+def serve(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--vendor-dir", default=VENDOR_DIR)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if sync_playwright is None:
+        sys.exit("playwright is not installed: pip install playwright && playwright install chromium")
+
+    server = serve(make_app())
+    url = f"http://127.0.0.1:{server.server_port}/chat"
+    external = {}
+    route = third_party_route(args.vendor_dir, external)
+
+    results = {"cold": [], "warm": []}
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        for _ in range(args.runs):
+            context = browser.new_context()
+            page = context.new_page()
+            page.route("**/*", route)
+            page.goto(url, wait_until="load")
+            page.wait_for_function("performance.getEntriesByName('chat-ready').length > 0", timeout=10000)
+            results["cold"].append(page.evaluate(TIMINGS_JS))
+            page.reload(wait_until="load")
+            page.wait_for_function("performance.getEntriesByName('chat-ready').length > 0", timeout=10000)
+            results["warm"].append(page.evaluate(TIMINGS_JS))
+            context.close()
+        browser.close()
+    server.shutdown()
+
+    summary = {}
+    for kind, runs in results.items():
+        summary[kind] = {
+            metric: {"p50": percentile([r[metric] for r in runs], 50),
+                     "p95": percentile([r[metric] for r in runs], 95)}
+            for metric in ("dom_content_loaded", "load", "ready", "transferred", "requests")
+        }
+    if args.json:
+        print(json.dumps({"summary": summary, "external": external}, indent=2))
+        return
+    for kind, metrics in summary.items():
+        print(f"{kind} load ({args.runs} runs)")
+        for metric, stats in metrics.items():
+            unit = "B" if metric == "transferred" else ("" if metric == "requests" else "ms")
+            print(f"  {metric:20s} p50 {stats['p50']!s:>10}{unit}   p95 {stats['p95']!s:>10}{unit}")
+    for request_url, how in sorted(external.items()):
+        print(f"  external {how}: {request_url}")
+
+
+if __name__ == "__main__":
+    main()
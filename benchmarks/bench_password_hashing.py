@@ -0,0 +1,66 @@
+"""Password hashing capacity benchmark.
+
+Measures how many logins/sec the scrypt hasher sustains single-threaded and through the
+bounded pool, so worker counts and cost parameters can be sized together.
+
+    python benchmarks/bench_password_hashing.py --seconds 5 --workers 4
+    PASSWORD_SCRYPT_N=32768 python benchmarks/bench_password_hashing.py
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hasher import PasswordHasher  # noqa: E402
+
+
+def run(hasher, stored, seconds, clients):
+    """Drive verify() from `clients` threads for `seconds`; return completed logins"""
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        done = 0
+        while time.perf_counter() < deadline:
+            hasher.verify("correct horse battery staple", stored)
+            done += 1
+        return done
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return sum(pool.map(lambda _: client(), range(clients)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="hashing pool size (defaults to CPU count)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    single = PasswordHasher(workers=1)
+    pooled = PasswordHasher(workers=args.workers)
+    stored = single.hash("correct horse battery staple")
+
+    started = time.perf_counter()
+    single.verify("correct horse battery staple", stored)
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    print(f"scrypt n={single.n} r={single.r} p={single.p}, {cores} cores")
+    print(f"single verify latency: {latency_ms:.1f} ms")
+
+    done = run(single, stored, args.seconds, 1)
+    per_core = done / args.seconds
+    print(f"1 worker:  {per_core:8.1f} logins/sec")
+
+    done = run(pooled, stored, args.seconds, args.workers * 2)
+    rate = done / args.seconds
+    print(f"{args.workers} workers: {rate:8.1f} logins/sec "
+          f"({rate / min(args.workers, cores):.1f} per core, "
+          f"scaling {rate / per_core:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
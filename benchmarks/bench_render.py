@@ -0,0 +1,149 @@
+"""Frame-time benchmark for the chat page with very long chats and chat histories.
+
+Serves a synthetic chat of --messages messages (mixed plain, markdown and code replies)
+and a sidebar of --chats chats, then in headless Chromium measures the time until the
+chat UI is ready, how many DOM nodes it holds, and frame times while scrolling the
+message list to the top (paging in older messages on the way) and the sidebar to the end.
+A frame over 16.7 ms is a dropped frame at 60 Hz.
+
+Replies are rendered with the real marked bundle, since markdown parsing is part of the
+cost being measured: it is loaded from --vendor-dir, and the run stops if it is missing.
+Needs Playwright and its Chromium build, which are not in requirements.txt:
+
+    pip install playwright && playwright install chromium
+    mkdir -p benchmarks/vendor && curl -Lo benchmarks/vendor/marked.min.js \\
+        https://cdn.jsdelivr.net/npm/marked/marked.min.js
+    python benchmarks/bench_render.py --messages 10000 --chats 10000
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_page_load import (  # noqa: E402
+    make_app, serve, percentile, sync_playwright, third_party_route, VENDOR_DIR)
+
+FRAME_BUDGET_MS = 1000 / 60
+MARKED_BUNDLE = "marked.min.js"
+
+# Scrolls `selector` by `step` px per animation frame until it stops moving (or `limit` frames),
+# returning the time between consecutive frames
+SCROLL_JS = """async ([selector, step, limit]) => {
+    const scroller = document.querySelector(selector);
+    const frames = [];
+    let previous = await new Promise(requestAnimationFrame);
+    let still = 0;
+    while (frames.length < limit && still < 30) {
+        const before = scroller.scrollTop;
+        scroller.scrollTop += step;
+        const now = await new Promise(requestAnimationFrame);
+        frames.push(now - previous);
+        previous = now;
+        still = scroller.scrollTop === before ? still + 1 : 0;
+    }
+    return frames;
+}"""
+
+READY_JS = """() => ({
+    ready: performance.getEntriesByName('chat-ready')[0].startTime,
+    nodes: document.getElementsByTagName('*').length,
+    heap: performance.memory ? performance.memory.usedJSHeapSize : null,
+})"""
+
+REPLIES = [
+    "Sure, here is a short answer.",
+    "A longer reply with **bold**, _emphasis_ and a list:\n\n- first point\n- second point\n- third point",
+    "Some code:\n\n```python\ndef add(a, b):\n    return a + b\n```\n\nThat's all.",
+    "Paragraph one explains the background in a few sentences of prose.\n\nParagraph two follows up.",
+]
+
+
+def synthetic_messages(count):
+    return [{"role": "user", "content": f"Question number {i // 2}?"} if i % 2 == 0
+            else {"role": "assistant", "content": REPLIES[(i // 2) % len(REPLIES)]}
+            for i in range(count)]
+
+
+def synthetic_chats(count):
+    return [{"chat_id": f"chat-{i}", "title": f"Synthetic chat {i}", "updated": count - i}
+            for i in range(count)]
+
+
+def frame_stats(frames):
+    return {
+        "frames": len(frames),
+        "p50_ms": percentile(frames, 50),
+        "p95_ms": percentile(frames, 95),
+        "max_ms": max(frames) if frames else None,
+        "long_frames": sum(1 for f in frames if f > FRAME_BUDGET_MS + 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--step", type=int, default=400, help="pixels scrolled per frame")
+    parser.add_argument("--max-frames", type=int, default=3000)
+    parser.add_argument("--vendor-dir", default=VENDOR_DIR, help=f"directory holding {MARKED_BUNDLE}")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if sync_playwright is None:
+        sys.exit("playwright is not installed: pip install playwright && playwright install chromium")
+    if not os.path.isfile(os.path.join(args.vendor_dir, MARKED_BUNDLE)):
+        sys.exit(f"{MARKED_BUNDLE} not found in {args.vendor_dir}; without it replies render as plain "
+                 "text and the markdown cost isn't measured (see the instructions at the top of this file)")
+
+    server = serve(make_app(synthetic_chats(args.chats), synthetic_messages(args.messages)))
+    url = f"http://127.0.0.1:{server.server_port}/chat"
+
+    runs = []
+    external = {}
+    with sync_playwright() as p:
+        browser = p.chromium.launch(args=["--enable-precise-memory-info"])
+        for _ in range(args.runs):
+            context = browser.new_context(viewport={"width": 1280, "height": 800})
+            page = context.new_page()
+            page.route("**/*", third_party_route(args.vendor_dir, external))
+            page.goto(url, wait_until="load")
+            page.wait_for_function("performance.getEntriesByName('chat-ready').length > 0", timeout=60000)
+            run = page.evaluate(READY_JS)
+            run["messages"] = frame_stats(page.evaluate(SCROLL_JS, ["#messages", -args.step, args.max_frames]))
+            run["sidebar"] = frame_stats(page.evaluate(SCROLL_JS, ["#history", args.step, args.max_frames]))
+            run["nodes_after_scroll"] = page.evaluate("document.getElementsByTagName('*').length")
+            runs.append(run)
+            context.close()
+        browser.close()
+    server.shutdown()
+
+    summary = {
+        "ready_ms": percentile([r["ready"] for r in runs], 50),
+        "dom_nodes": percentile([r["nodes"] for r in runs], 50),
+        "dom_nodes_after_scroll": percentile([r["nodes_after_scroll"] for r in runs], 50),
+        "heap_bytes": percentile([r["heap"] for r in runs], 50),
+    }
+    for scroller in ("messages", "sidebar"):
+        summary[scroller] = {key: percentile([r[scroller][key] for r in runs], 50)
+                             for key in ("frames", "p50_ms", "p95_ms", "max_ms", "long_frames")}
+    if args.json:
+        print(json.dumps({"summary": summary, "runs": runs, "external": external}, indent=2))
+        return
+    print(f"{args.messages} messages, {args.chats} chats, median of {args.runs} runs")
+    print(f"  chat ready          {summary['ready_ms']:.1f} ms")
+    print(f"  DOM nodes           {summary['dom_nodes']} (after scrolling: {summary['dom_nodes_after_scroll']})")
+    if summary["heap_bytes"]:
+        print(f"  JS heap             {summary['heap_bytes'] / 1e6:.1f} MB")
+    for scroller in ("messages", "sidebar"):
+        s = summary[scroller]
+        print(f"  scroll {scroller:9s}    {s['frames']} frames, p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms, "
+              f"max {s['max_ms']:.1f} ms, {s['long_frames']} over {FRAME_BUDGET_MS:.1f} ms")
+    for request_url, how in sorted(external.items()):
+        print(f"  external {how}: {request_url}")
+
+
+if __name__ == "__main__":
+    main()
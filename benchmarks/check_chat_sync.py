@@ -0,0 +1,66 @@
+"""Chat list change feed check (/chats?since=).
+
+Runs app1 in local storage mode and exits non-zero unless:
+
+- renaming a chat returns just that chat as a change, without the "ids" list;
+- deleting a chat returns its id in "deleted", without the "ids" list;
+- a chat removed without a tombstone, or a version older than the tombstones kept, gets
+  the "ids" list so clients can still drop it.
+
+    python benchmarks/check_chat_sync.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def main():
+    os.environ.update(STORAGE_MODE="local", LOG_LEVEL="ERROR", AUTH_MODE="session")
+    os.chdir(tempfile.mkdtemp(prefix="check-chat-sync-"))
+    import app1
+    client = app1.app.test_client()
+    client.post("/register", json={"username": "sync", "email": "s@example.com", "password": "Passw0rd!x"})
+    client.post("/login", json={"email": "s@example.com", "password": "Passw0rd!x"})
+    chat_ids = [client.post("/new_chat").get_json()["chat_id"] for _ in range(3)]
+    results = []
+
+    def since(version):
+        return client.get(f"/chats?since={version}").get_json()
+
+    print("rename:")
+    version = client.get("/chats").headers["ETag"].strip('W/"')
+    client.post("/rename_chat", json={"chat_id": chat_ids[0], "title": "Renamed"})
+    body = since(version)
+    results.append(check("one change", [c["chat_id"] for c in body["changes"]] == [chat_ids[0]], repr(body["changes"])))
+    results.append(check("no ids", "ids" not in body, repr(body.get("ids"))))
+
+    print("delete:")
+    version = body["version"]
+    client.delete(f"/delete_chat/{chat_ids[1]}")
+    body = since(version)
+    results.append(check("deleted listed", body["deleted"] == [chat_ids[1]], repr(body["deleted"])))
+    results.append(check("no changes", body["changes"] == []))
+    results.append(check("no ids", "ids" not in body, repr(body.get("ids"))))
+
+    print("deletion without a tombstone:")
+    version = body["version"]
+    app1.supabase.table("conversations").delete().eq("id", chat_ids[2]).execute()
+    body = since(version)
+    results.append(check("ids sent", body.get("ids") == [chat_ids[0]], repr(body.get("ids"))))
+
+    print("version older than the tombstones kept:")
+    body = since(f"2-{app1.tombstone_horizon() - 60!r}")
+    results.append(check("ids sent", body.get("ids") == [chat_ids[0]], repr(body.get("ids"))))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Model failover check for the chat path.
+
+Runs the app's own OpenRouter call (app1.call_openrouter through the model router) against
+the stub upstream, with the first model failing, and exits non-zero unless:
+
+- a non-JSON 502 (a proxy's HTML error page) from the first model fails over to the next,
+  which answers the request;
+- a 400 from the first model is raised at once, without trying the others.
+
+    python benchmarks/check_failover.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+
+from stub_upstreams import StubConfig, start_stubs  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def main():
+    config = StubConfig(llm_ttft=0.0, llm_tokens=5, llm_token_delay=0.0)
+    servers, env = start_stubs(config)
+    os.environ.update({k: v for k, v in env.items() if k.startswith("OPENROUTER")})
+    os.environ.update(STORAGE_MODE="local", LOG_LEVEL="ERROR")
+    os.chdir(tempfile.mkdtemp(prefix="check-failover-"))
+    import app1
+    router = app1.model_router
+    first, second = router.candidates(len(MESSAGES[0]["content"]))[:2]
+    results = []
+
+    print(f"502 HTML from {first}:")
+    config.llm_failures = {first: 502}
+    try:
+        reply = app1.call_openrouter(MESSAGES)
+        results.append(check("reply from the next model", reply.startswith("token"), repr(reply[:20])))
+    except Exception as e:
+        results.append(check("reply from the next model", False, f"{type(e).__name__}: {e}"))
+    stats = router.snapshot()
+    results.append(check(f"{first} charged one error", stats[first]["errors"] == 1))
+    results.append(check(f"{second} answered", stats[second]["requests"] == 1 and not stats[second]["errors"]))
+
+    print("400 from every model:")
+    config.llm_failures = {model["id"]: 400 for model in router.models}
+    before = {model_id: s["requests"] for model_id, s in router.snapshot().items()}
+    try:
+        app1.call_openrouter(MESSAGES)
+        results.append(check("raised", False, "no error"))
+    except requests.HTTPError as e:
+        results.append(check("raised the 400", e.response is not None and e.response.status_code == 400))
+    after = router.snapshot()
+    results.append(check("no model charged", all(after[m]["requests"] == before[m] for m in before)))
+
+    for server in servers.values():
+        server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
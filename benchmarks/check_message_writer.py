@@ -0,0 +1,111 @@
+"""Durability check for the message writer and the /chat path that uses it.
+
+Exits non-zero unless:
+
+- messages still buffered when the writer is closed are written by close(), with the
+  conversation's updated time bumped to its last message;
+- a batch whose insert keeps failing is spilled to the pending file and written by the
+  next writer that starts;
+- a /chat turn in a Supabase chat (the local store stands in for Supabase) goes through
+  app1's message writer and comes back from /get_chat, with the chat list's version moved.
+
+    python benchmarks/check_message_writer.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from message_writer import MessageWriter  # noqa: E402
+from storage import LocalClient  # noqa: E402
+from stub_upstreams import StubConfig, start_stubs  # noqa: E402
+
+
+def check(name, ok, detail=""):
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+def rows(client, conversation_id):
+    return client.table("messages").select("content").eq("conversation_id", conversation_id).execute().data
+
+
+def conversation(client, conversation_id):
+    return client.table("conversations").select("*").eq("id", conversation_id).execute().data[0]
+
+
+def check_flush_on_close(workdir):
+    print("flush on close:")
+    client = LocalClient(os.path.join(workdir, "close.json"))
+    chat_id = client.table("conversations").insert({"title": "t", "updated": 0}).execute().data[0]["id"]
+    # Long intervals: nothing is written unless close() writes it
+    writer = MessageWriter(lambda: client, flush_interval=60, touch_interval=60,
+                           pending_file=os.path.join(workdir, "close.jsonl"))
+    writer.add(chat_id, "user", "one")
+    writer.add(chat_id, "assistant", "two")
+    writer.close()
+    written = [r["content"] for r in rows(client, chat_id)]
+    return [check("buffered messages written", written == ["one", "two"], repr(written)),
+            check("conversation touched", conversation(client, chat_id)["updated"] > 0)]
+
+
+def check_spill_replay(workdir):
+    print("spill and replay:")
+    pending = os.path.join(workdir, "spill.jsonl")
+    client = LocalClient(os.path.join(workdir, "spill.json"))
+    chat_id = client.table("conversations").insert({"title": "t", "updated": 0}).execute().data[0]["id"]
+
+    def unreachable():
+        raise ConnectionError("database down")
+
+    writer = MessageWriter(unreachable, flush_interval=0.001, max_retries=1, pending_file=pending)
+    writer.add(chat_id, "user", "kept")
+    writer.close()
+    results = [check("failed batch spilled", os.path.exists(pending) and writer.stats["spilled"] == 1)]
+    replay = MessageWriter(lambda: client, flush_interval=0.001, pending_file=pending)
+    replay.start()
+    replay.close()
+    written = [r["content"] for r in rows(client, chat_id)]
+    results.append(check("spilled batch replayed", written == ["kept"], repr(written)))
+    results.append(check("pending file removed", not os.path.exists(pending)))
+    results.append(check("conversation touched", conversation(client, chat_id)["updated"] > 0))
+    return results
+
+
+def check_chat_route(workdir):
+    print("/chat through the writer:")
+    servers, env = start_stubs(StubConfig(llm_ttft=0.0, llm_tokens=3, llm_token_delay=0.0))
+    os.environ.update({k: v for k, v in env.items() if k.startswith("OPENROUTER")})
+    os.environ.update(STORAGE_MODE="local", LOG_LEVEL="ERROR", AUTH_MODE="session")
+    os.chdir(workdir)
+    import app1
+    app1.message_writer.pending_file = os.path.join(workdir, "chat.jsonl")
+    client = app1.app.test_client()
+    client.post("/register", json={"username": "writer", "email": "w@example.com", "password": "Passw0rd!x"})
+    login = client.post("/login", json={"email": "w@example.com", "password": "Passw0rd!x"})
+    results = [check("logged in", login.status_code == 200, str(login.status_code))]
+    chat_id = client.post("/new_chat").get_json()["chat_id"]
+    before = client.get("/chats").headers.get("ETag")
+    reply = client.post("/chat", json={"message": "hello", "chat_id": chat_id})
+    results.append(check("reply", reply.status_code == 200, str(reply.status_code)))
+    app1.message_writer.close()
+    messages = client.get(f"/get_chat/{chat_id}").get_json()
+    roles = [m["role"] for m in messages]
+    results.append(check("turn stored", roles == ["user", "assistant"] and messages[0]["content"] == "hello",
+                         repr(roles)))
+    results.append(check("chat list version moved", client.get("/chats").headers.get("ETag") != before))
+    for server in servers.values():
+        server.shutdown()
+    return results
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="check-writer-")
+    results = check_flush_on_close(workdir) + check_spill_replay(workdir) + check_chat_route(workdir)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Startup time budget check for app1.
+
+Imports the app in fresh interpreters (local-only storage, empty working directory) and
+exits non-zero if the median import time is over budget, or if a module that is meant to
+load lazily was imported at startup. Run it in CI to catch startup regressions:
+
+    python benchmarks/check_startup.py --runs 10 --budget-ms 500
+    python benchmarks/check_startup.py --importtime   # also list the slowest imports
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 500))
+# Must not be imported until first use: the Supabase client and its HTTP stack
+LAZY_MODULES = ("supabase", "postgrest", "gotrue", "httpx")
+
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import app1
+imported = time.perf_counter()
+app1.app.test_client().get('/login')
+first_request = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first_request - imported) * 1000,
+    "lazy_imported": sorted(m for m in %r if m in sys.modules),
+}))
+""" % (LAZY_MODULES,)
+
+
+def probe(env, importtime=False):
+    """Import the app once in a new interpreter; returns (result dict, -X importtime lines)"""
+    with tempfile.TemporaryDirectory() as cwd:
+        args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE]
+        proc = subprocess.run(args, cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        sys.exit(f"importing app1 failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr.splitlines()
+
+
+def slowest_imports(lines, count):
+    """Modules imported directly by app1, by cumulative time, from -X importtime output"""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # nested imports are indented under their parent
+        if depth == 1:
+            rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports")
+    args = parser.parse_args()
+
+    env = dict(os.environ, STORAGE_MODE="local", PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    probe(env)  # warm the filesystem cache and the installed packages' bytecode
+    results = [probe(env)[0] for _ in range(args.runs)]
+    import_ms = sorted(r["import_ms"] for r in results)
+    first_ms = sorted(r["first_request_ms"] for r in results)
+    median = import_ms[len(import_ms) // 2]
+
+    print(f"import app1: median {median:.1f} ms, min {import_ms[0]:.1f} ms, max {import_ms[-1]:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms, {args.runs} runs)")
+    print(f"first request: median {first_ms[len(first_ms) // 2]:.1f} ms")
+    if args.importtime:
+        for cumulative_us, name in slowest_imports(probe(env, importtime=True)[1], 15):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"import time {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    lazy = sorted({m for r in results for m in r["lazy_imported"]})
+    if lazy:
+        failures.append(f"imported at startup but should load on first use: {', '.join(lazy)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""End-to-end load test of the app against local stub upstreams.
+
+Starts the stubs from stub_upstreams.py, runs app1 in a separate process pointed at them,
+signs up one user per virtual client, then has the clients call /login, /chats, /get_chat,
+/chat and /generate-image in the given mix for a fixed time. Reports throughput and
+p50/p95/p99 latency per endpoint. Everything runs offline.
+
+    python benchmarks/load_test.py --concurrency 20 --duration 30   # needs supabase-py
+    python benchmarks/load_test.py --mix chats=50,get_chat=50 --storage local
+    python benchmarks/load_test.py --target http://127.0.0.1:5000   # an app you started
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from collections import defaultdict
+
+import requests
+
+from bench_page_load import percentile
+from stub_upstreams import StubConfig, add_arguments, start_stubs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("login", "chats", "get_chat", "chat", "generate_image")
+DEFAULT_MIX = "login=5,chats=35,get_chat=30,chat=25,generate_image=5"
+# Per-user limits would turn most of a load test into 429s
+UNLIMITED_RATES = "chat=1000000/60;generate_image=1000000/60"
+
+APP_SERVER = """
+import sys
+from werkzeug.serving import make_server
+import app1
+make_server("127.0.0.1", int(sys.argv[1]), app1.app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(env, cwd, timeout=30):
+    """Run app1 under a threaded WSGI server in a new process; returns (process, base url).
+
+    The app's output goes to app.log in `cwd`.
+    """
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    log_path = os.path.join(cwd, "app.log")
+    with open(log_path, "w") as log_file:
+        proc = subprocess.Popen([sys.executable, "-c", APP_SERVER, str(port)], cwd=cwd, env=env,
+                                stdout=log_file, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            requests.get(f"{base}/login", timeout=1)
+            return proc, base
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    with open(log_path) as f:
+        sys.exit(f"the app failed to start:\n{f.read()[-2000:]}")
+
+
+def parse_mix(spec):
+    """"chats=35,chat=25" -> [(endpoint, weight)]"""
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            sys.exit(f"unknown endpoint in --mix: {name} (choose from {', '.join(SCENARIOS)})")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+class VirtualUser:
+    """One client with its own account, cookie session and chat"""
+    def __init__(self, base, index):
+        self.base = base
+        self.email = f"load{index}@example.com"
+        self.password = "load-test-password"
+        self.http = requests.Session()
+        self.chat_id = None
+        self.sent = 0
+
+    def setup(self):
+        self.http.post(f"{self.base}/register", json={
+            "email": self.email, "username": self.email.split("@")[0], "password": self.password})
+        self.login()
+        self.chat_id = self.http.post(f"{self.base}/new_chat").json().get("chat_id")
+
+    def login(self):
+        return self.http.post(f"{self.base}/login", json={"email": self.email, "password": self.password})
+
+    def chats(self):
+        return self.http.get(f"{self.base}/chats")
+
+    def get_chat(self):
+        return self.http.get(f"{self.base}/get_chat/{self.chat_id}")
+
+    def chat(self):
+        self.sent += 1
+        # Distinct text so identical concurrent requests aren't coalesced
+        return self.http.post(f"{self.base}/chat", json={
+            "chat_id": self.chat_id, "message": f"{self.email} message {self.sent}"})
+
+    def generate_image(self):
+        self.sent += 1
+        return self.http.post(f"{self.base}/generate-image", json={
+            "prompt": f"{self.email} picture {self.sent}", "model": "flux"})
+
+
+def run(users, mix, duration):
+    """Each user calls endpoints from `mix` back to back until `duration` is up"""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results = defaultdict(list)  # endpoint -> [(seconds, status)]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(user):
+        samples = []
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = getattr(user, name)().status_code
+            except requests.RequestException:
+                status = "error"
+            samples.append((name, time.perf_counter() - started, status))
+        with lock:
+            for name, seconds, status in samples:
+                results[name].append((seconds, status))
+
+    threads = [threading.Thread(target=client, args=(user,)) for user in users]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - started
+
+
+def summarize(results, elapsed):
+    summary = {}
+    for name, samples in sorted(results.items()):
+        latencies = [seconds * 1000 for seconds, _ in samples]
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        ok = sum(count for status, count in statuses.items() if status in ("200", "201", "204", "304"))
+        summary[name] = {
+            "requests": len(samples),
+            "errors": len(samples) - ok,
+            "statuses": dict(statuses),
+            "throughput": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+        }
+    total = sum(s["requests"] for s in summary.values())
+    summary["total"] = {"requests": total, "errors": sum(s["errors"] for s in summary.values()),
+                        "throughput": round(total / elapsed, 2)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights")
+    parser.add_argument("--storage", choices=("supabase", "local"), default="supabase",
+                        help="stub Supabase REST API, or the app's local-only store")
+    parser.add_argument("--target", help="load an already running app instead of starting one")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="don't lift the per-user limits")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    # Without the client library every request of the app would fail, not measure anything
+    if not args.target and args.storage == "supabase" and importlib.util.find_spec("supabase") is None:
+        parser.error("--storage supabase needs supabase-py (pip install supabase); "
+                     "use --storage local to run without it")
+
+    config = StubConfig.from_args(args)
+    servers, stub_env = start_stubs(config)
+    proc = None
+    with tempfile.TemporaryDirectory() as cwd:
+        if args.target:
+            base = args.target.rstrip("/")
+        else:
+            env = dict(os.environ, PYTHONPATH=ROOT, STORAGE_MODE=args.storage, LOG_LEVEL="WARNING", **stub_env)
+            if not args.keep_rate_limits:
+                env.setdefault("RATE_LIMITS", UNLIMITED_RATES)
+            proc, base = start_app(env, cwd)
+        try:
+            users = [VirtualUser(base, i) for i in range(args.concurrency)]
+            for user in users:
+                user.setup()
+            results, elapsed = run(users, mix, args.duration)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+            for server in servers.values():
+                server.shutdown()
+
+    summary = summarize(results, elapsed)
+    if args.json:
+        print(json.dumps({"config": vars(args), "summary": summary}, indent=2))
+        return
+    print(f"{args.concurrency} clients for {elapsed:.1f}s against {args.target or f'app1 ({args.storage})'}")
+    print(f"  {'endpoint':16s} {'requests':>9s} {'errors':>7s} {'req/s':>8s} {'p50':>9s} {'p95':>9s} {'p99':>9s}")
+    for name, stats in summary.items():
+        if name == "total":
+            continue
+        print(f"  {name:16s} {stats['requests']:9d} {stats['errors']:7d} {stats['throughput']:8.2f} "
+              f"{stats['p50_ms']:7.1f}ms {stats['p95_ms']:7.1f}ms {stats['p99_ms']:7.1f}ms")
+        if stats["errors"]:
+            print(f"  {'':16s} statuses {stats['statuses']}")
+    total = summary["total"]
+    print(f"  {'total':16s} {total['requests']:9d} {total['errors']:7d} {total['throughput']:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Microbenchmarks for the storage and serialization hot paths, by history size.
+
+Cases run the app's own code (local-only storage, in a scratch directory):
+
+- save_conversations: write chat_history.json holding `size` messages
+- message_append: append a user/assistant pair to a chat of `size` messages and save,
+  as /chat does for local chats
+- list_chats: GET /chats for one of 10 users, with `size` messages spread over chats of
+  MESSAGES_PER_CHAT messages
+- get_chat: GET /get_chat for a chat of `size` messages (lookup, slice, JSON response)
+- image_base64: base64-encode an image of `size` bytes, as the image clients do
+
+Results are saved per commit under benchmarks/results/ and can be compared with an
+earlier run; any case slower than the threshold fails the run.
+
+    python benchmarks/microbench.py --sizes 100,10000,1000000 --save
+    python benchmarks/microbench.py --baseline benchmarks/results/3c0e812.json --threshold 15
+"""
+import os
+import sys
+import json
+import time
+import base64
+import timeit
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = "100,1000,10000,100000"
+DEFAULT_IMAGE_SIZES = "100000,1000000,5000000"
+MESSAGES_PER_CHAT = 50
+USERS = 10
+
+
+def load_app():
+    """Import app1 in local-only mode from a scratch working directory"""
+    os.environ.setdefault("STORAGE_MODE", "local")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # The per-user request budget would turn most timed requests into 429s
+    os.environ.setdefault("RATE_LIMIT_USER", "1000000000/60")
+    os.chdir(tempfile.mkdtemp(prefix="microbench-"))
+    import app1
+    return app1
+
+
+def message(i):
+    role = "user" if i % 2 == 0 else "assistant"
+    return {"role": role, "content": f"Message {i}: " + "lorem ipsum dolor sit amet " * 8}
+
+
+def conversations_with(size, chats):
+    """`size` messages spread evenly over `chats` chats owned by USERS users"""
+    data = {}
+    per_chat = max(1, size // chats)
+    for c in range(chats):
+        data[f"chat{c}"] = {
+            "user_id": f"user{c % USERS}",
+            "title": f"Chat {c}",
+            "updated": float(c),
+            "messages": [{"role": "system", "content": "system prompt"}] + [message(i) for i in range(per_chat)],
+        }
+    return data
+
+
+def client_for(app1, user_id):
+    client = app1.app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def checked_get(client, path):
+    def get():
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return get
+
+
+def case_save_conversations(app1, size):
+    app1.conversations._data = conversations_with(size, max(1, size // MESSAGES_PER_CHAT))
+    return app1.save_conversations
+
+
+def case_message_append(app1, size):
+    app1.conversations._data = conversations_with(size, 1)
+    chat = app1.conversations["chat0"]
+
+    def append():
+        chat["messages"].extend([{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+        chat["updated"] = time.time()
+        app1.save_conversations()
+        del chat["messages"][-2:]  # keep the size fixed across iterations
+    return append
+
+
+def case_list_chats(app1, size):
+    app1.conversations._data = conversations_with(size, max(1, size // MESSAGES_PER_CHAT))
+    client = client_for(app1, "user0")
+    return checked_get(client, "/chats")
+
+
+def case_get_chat(app1, size):
+    app1.conversations._data = conversations_with(size, 1)
+    client = client_for(app1, "user0")
+    return checked_get(client, "/get_chat/chat0")
+
+
+def case_image_base64(app1, size):
+    image = os.urandom(size)
+    return lambda: base64.b64encode(image).decode("utf-8")
+
+
+HISTORY_CASES = {
+    "save_conversations": case_save_conversations,
+    "message_append": case_message_append,
+    "list_chats": case_list_chats,
+    "get_chat": case_get_chat,
+}
+IMAGE_CASES = {"image_base64": case_image_base64}
+
+
+def measure(fn, repeat):
+    """Seconds per call: (median, min) over `repeat` rounds"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()  # calls per round so a round takes at least 0.2s
+    rounds = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return statistics.median(rounds), min(rounds)
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline, threshold):
+    """Print changes against `baseline`; returns the number of regressions.
+
+    Compares the fastest round, which is less affected by other load on the machine.
+    """
+    regressions = 0
+    for case, sizes in results.items():
+        for size, stats in sizes.items():
+            old = baseline.get(case, {}).get(size)
+            if not old:
+                continue
+            change = (stats["min_s"] - old["min_s"]) / old["min_s"] * 100
+            flag = "REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"  {case:20s} {size:>9s}  {old['min_s'] * 1000:10.3f}ms -> "
+                  f"{stats['min_s'] * 1000:10.3f}ms  {change:+7.1f}%  {flag}")
+    return regressions
+
+
+def sizes_arg(value):
+    return [int(float(v)) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=sizes_arg, default=sizes_arg(DEFAULT_SIZES), help="history sizes (messages)")
+    parser.add_argument("--image-sizes", type=sizes_arg, default=sizes_arg(DEFAULT_IMAGE_SIZES), help="image sizes (bytes)")
+    parser.add_argument("--cases", help="comma-separated subset of cases")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help=f"store results in {os.path.relpath(RESULTS_DIR, ROOT)}/")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    args = parser.parse_args()
+
+    revision = git_revision()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    app1 = load_app()
+    selected = set(args.cases.split(",")) if args.cases else None
+    plan = [(name, case, args.sizes) for name, case in HISTORY_CASES.items()]
+    plan += [(name, case, args.image_sizes) for name, case in IMAGE_CASES.items()]
+
+    results = {}
+    print(f"microbenchmarks at {revision} (median of {args.repeat} rounds)")
+    for name, case, sizes in plan:
+        if selected and name not in selected:
+            continue
+        for size in sizes:
+            median, best = measure(case(app1, size), args.repeat)
+            results.setdefault(name, {})[str(size)] = {"median_s": median, "min_s": best}
+            print(f"  {name:20s} {size:>9d}  {median * 1000:10.3f}ms  (min {best * 1000:.3f}ms)")
+
+    report = {"revision": revision, "python": platform.python_version(), "machine": platform.machine(),
+              "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{revision}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"saved {path}")
+    if baseline is not None:
+        print(f"compared with {baseline.get('revision')} (threshold {args.threshold}%)")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
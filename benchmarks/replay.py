@@ -0,0 +1,233 @@
+"""Replay recorded traffic against a running app and compare runs.
+
+Input is JSON lines, one request per line, as written by the app's access log
+(ACCESS_LOG=1, "http_request" events):
+
+    {"start": 1760000000.123, "method": "POST", "route": "/chat", "path": "/chat",
+     "query": {}, "user": "<id>", "message_chars": 42, "status": 200, "ms": 812.5}
+
+Only method and path (or route) are required; other log lines are skipped. Each recorded
+user is played by a virtual user with its own account and chat, so ids in paths are
+remapped and request bodies are rebuilt with the recorded text lengths. Requests go out
+on the recorded schedule divided by --speed (0 sends them as fast as --concurrency allows).
+
+    python benchmarks/replay.py run access.jsonl --target http://127.0.0.1:5000 --speed 5 -o before.json
+    python benchmarks/replay.py run access.jsonl --target http://127.0.0.1:5001 --speed 5 -o after.json
+    python benchmarks/replay.py compare before.json after.json --threshold 10
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_page_load import percentile
+from load_test import VirtualUser
+
+# Replaying these would change the account or session the rest of the replay depends on
+SKIPPED_ROUTES = ("/register", "/logout", "/token/refresh", "/reset-password", "/admin/profile")
+PERCENTILES = (50, 95, 99)
+
+
+def parse_time(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+def load_records(path):
+    """Recorded requests from a JSONL file, sorted by start time, with offsets in seconds"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or not record.get("method") or not (record.get("path") or record.get("route")):
+                continue
+            start = parse_time(record.get("start"))
+            if start is None:
+                # Log timestamps mark the end of the request
+                end = parse_time(record.get("ts"))
+                start = end - record.get("ms", 0) / 1000 if end is not None else None
+            record["start"] = start
+            records.append(record)
+    if records and all(r["start"] is not None for r in records):
+        records.sort(key=lambda r: r["start"])
+        first = records[0]["start"]
+        for record in records:
+            record["offset"] = record["start"] - first
+    else:
+        # No timing recorded: keep file order, back to back
+        for record in records:
+            record["offset"] = 0.0
+    return records
+
+
+def text_of(length, default=40):
+    length = length if isinstance(length, int) and length > 0 else default
+    return ("replayed " * (length // 9 + 1))[:length]
+
+
+def replay_request(user, record):
+    """Send the recorded request as `user`; returns the response, or None if not replayable"""
+    method = record["method"].upper()
+    route = record.get("route") or record["path"]
+    base = user.base
+    if route in SKIPPED_ROUTES:
+        return None
+    if route == "/login" and method == "POST":
+        return user.login()
+    if route == "/chat" and method == "POST":
+        return user.http.post(f"{base}/chat", json={
+            "chat_id": user.chat_id, "message": text_of(record.get("message_chars")),
+            "quality": record.get("quality", "fast")})
+    if route == "/generate-image" and method == "POST":
+        return user.http.post(f"{base}/generate-image", json={
+            "prompt": text_of(record.get("prompt_chars")), "model": record.get("model", "flux")})
+    if route == "/new_chat" and method == "POST":
+        return user.http.post(f"{base}/new_chat")
+    if route == "/rename_chat" and method == "POST":
+        return user.http.post(f"{base}/rename_chat", json={"chat_id": user.chat_id, "title": "Replayed chat"})
+    if route == "/delete_chat/<chat_id>" and method == "DELETE":
+        # Delete a fresh chat, not the one the user's other requests use
+        chat_id = user.http.post(f"{base}/new_chat").json().get("chat_id")
+        return user.http.delete(f"{base}/delete_chat/{chat_id}")
+    if method == "GET":
+        path = route.replace("<chat_id>", str(user.chat_id)) if "<" in route else record.get("path", route)
+        return user.http.get(f"{base}{path}", params=record.get("query") or None)
+    return None
+
+
+def replay(records, target, speed, concurrency):
+    """Send every record on schedule; returns ({route: [(ms, status)]}, skipped, max lag, seconds)"""
+    users = {}
+    for record in records:
+        key = record.get("user") or "anonymous"
+        if key not in users:
+            users[key] = VirtualUser(target, f"replay{len(users)}")
+    for user in users.values():
+        user.setup()
+
+    results = defaultdict(list)
+    skipped = defaultdict(int)
+    lock = threading.Lock()
+    lag = [0.0]
+
+    def send(record, scheduled):
+        user = users[record.get("user") or "anonymous"]
+        route = f"{record['method'].upper()} {record.get('route') or record['path']}"
+        started = time.perf_counter()
+        with lock:
+            lag[0] = max(lag[0], started - scheduled)
+        try:
+            response = replay_request(user, record)
+            status = response.status_code if response is not None else None
+        except requests.RequestException:
+            status = "error"
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            if status is None:
+                skipped[route] += 1
+            else:
+                results[route].append((elapsed, status))
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            scheduled = began + (record["offset"] / speed if speed else 0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, record, scheduled)
+    return results, dict(skipped), lag[0], time.perf_counter() - began
+
+
+def summarize(results):
+    summary = {}
+    for route, samples in sorted(results.items()):
+        latencies = [ms for ms, _ in samples]
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[str(status)] += 1
+        summary[route] = {"requests": len(samples), "statuses": dict(statuses)}
+        for pct in PERCENTILES:
+            summary[route][f"p{pct}_ms"] = round(percentile(latencies, pct), 1)
+    return summary
+
+
+def run_command(args):
+    records = load_records(args.log)
+    if not records:
+        sys.exit(f"{args.log}: no recorded requests (need JSON lines with method and path)")
+    results, skipped, lag, elapsed = replay(records, args.target.rstrip("/"), args.speed, args.concurrency)
+    summary = summarize(results)
+    report = {"target": args.target, "log": args.log, "speed": args.speed, "requests": len(records),
+              "seconds": round(elapsed, 2), "max_lag_ms": round(lag * 1000, 1), "skipped": skipped,
+              "routes": summary}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"replayed {len(records)} requests against {args.target} in {elapsed:.1f}s "
+          f"(speed {args.speed or 'max'}, max scheduling lag {lag * 1000:.0f}ms)")
+    for route, stats in summary.items():
+        print(f"  {route:32s} {stats['requests']:6d}  p50 {stats['p50_ms']:8.1f}ms  "
+              f"p95 {stats['p95_ms']:8.1f}ms  p99 {stats['p99_ms']:8.1f}ms  {stats['statuses']}")
+    for route, count in sorted(skipped.items()):
+        print(f"  {route:32s} {count:6d}  skipped")
+
+
+def compare_command(args):
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)["routes"]
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)["routes"]
+    regressions = 0
+    print(f"  {'route':32s} " + "  ".join(f"{'p' + str(p):>24s}" for p in PERCENTILES))
+    for route in sorted(set(before) | set(after)):
+        if route not in before or route not in after:
+            print(f"  {route:32s} only in {'after' if route in after else 'before'}")
+            continue
+        cells = []
+        for pct in PERCENTILES:
+            old, new = before[route][f"p{pct}_ms"], after[route][f"p{pct}_ms"]
+            change = (new - old) / old * 100 if old else 0.0
+            flag = "!" if change > args.threshold else " "
+            regressions += flag == "!"
+            cells.append(f"{old:8.1f} -> {new:8.1f} {change:+6.1f}%{flag}")
+        print(f"  {route:32s} " + "  ".join(cells))
+    if regressions:
+        print(f"{regressions} percentile(s) slower by more than {args.threshold}%")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="replay a recorded log against a running app")
+    run.add_argument("log", help="JSONL file of recorded requests")
+    run.add_argument("--target", default="http://127.0.0.1:5000")
+    run.add_argument("--speed", type=float, default=1.0, help="time compression; 0 = as fast as possible")
+    run.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    run.add_argument("-o", "--output", help="write the results as JSON, for compare")
+    run.set_defaults(func=run_command)
+    compare = commands.add_parser("compare", help="compare the latency of two replay runs")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    compare.set_defaults(func=compare_command)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Local stand-ins for the services the app calls, for offline load tests.
+
+- OpenRouter: POST /api/v1/chat/completions, plain JSON or SSE when "stream" is true, with
+  a configurable time to first token, completion length and per-token delay. Chosen models
+  can instead fail with a given status and an HTML body, like a proxy error page.
+- Hugging Face inference: POST /models/<model> returning image bytes of a given size after
+  a delay, or a 503 "model is loading" response for a fraction of calls (cold starts).
+- Supabase: the PostgREST calls the app makes (/rest/v1/<table> with select, eq/gt/lt/in/or
+  filters, order and limit) backed by storage.LocalClient.
+
+Run them on their own and point an app at them with the printed environment:
+
+    python benchmarks/stub_upstreams.py --hf-cold-rate 0.1 --image-bytes 500000
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, Response, jsonify, request  # noqa: E402
+
+from storage import LocalClient, LocalStoreError  # noqa: E402
+from bench_page_load import serve  # noqa: E402
+
+# supabase-py only accepts a JWT-shaped key; the stub never checks it
+STUB_SUPABASE_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.c3R1Yg"
+# Query parameters that are not column filters
+POSTGREST_PARAMS = ("select", "order", "limit", "offset", "columns", "on_conflict")
+
+
+class StubConfig:
+    """Latency and payload knobs shared by the stubs"""
+    def __init__(self, llm_ttft=0.3, llm_tokens=200, llm_token_delay=0.005, hf_latency=2.0,
+                 hf_cold_rate=0.0, image_bytes=300_000, db_latency=0.005, llm_failures=None):
+        self.llm_ttft = llm_ttft
+        self.llm_tokens = llm_tokens
+        self.llm_token_delay = llm_token_delay
+        self.hf_latency = hf_latency
+        self.hf_cold_rate = hf_cold_rate
+        self.image_bytes = image_bytes
+        self.db_latency = db_latency
+        self.llm_failures = dict(llm_failures or {})  # model -> HTTP status it answers with
+
+    @classmethod
+    def from_args(cls, args):
+        failures = {}
+        for part in (args.llm_fail or "").split(","):
+            model, _, status = part.rpartition("=")
+            if model:
+                failures[model] = int(status)
+        return cls(args.llm_ttft, args.llm_tokens, args.llm_token_delay, args.hf_latency,
+                   args.hf_cold_rate, args.image_bytes, args.db_latency, failures)
+
+
+def add_arguments(parser):
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="tokens per completion")
+    parser.add_argument("--llm-token-delay", type=float, default=0.005, help="seconds per token")
+    parser.add_argument("--hf-latency", type=float, default=2.0, help="seconds per generated image")
+    parser.add_argument("--hf-cold-rate", type=float, default=0.0, help="fraction of 503 cold starts")
+    parser.add_argument("--image-bytes", type=int, default=300_000, help="size of each generated image")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="seconds per Supabase call")
+    parser.add_argument("--llm-fail", help="models that fail, e.g. openai/gpt-4o-mini=502")
+
+
+def make_openrouter_app(config):
+    app = Flask("stub_openrouter")
+
+    @app.route("/api/v1/chat/completions", methods=["POST"])
+    def completions():
+        body = request.get_json(silent=True) or {}
+        model = body.get("model", "stub/model")
+        if model in config.llm_failures:
+            status = config.llm_failures[model]
+            return Response(f"<html><body><h1>{status} upstream error</h1></body></html>", status=status,
+                            content_type="text/html")
+        words = ["token"] * config.llm_tokens
+        if not body.get("stream"):
+            time.sleep(config.llm_ttft + config.llm_token_delay * config.llm_tokens)
+            return jsonify({
+                "id": "stub", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(json.dumps(body.get("messages", []))) // 4,
+                          "completion_tokens": config.llm_tokens},
+            })
+
+        def events():
+            time.sleep(config.llm_ttft)
+            for word in words:
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word + " "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                time.sleep(config.llm_token_delay)
+            yield "data: [DONE]\n\n"
+        return Response(events(), content_type="text/event-stream")
+
+    return app
+
+
+def make_huggingface_app(config):
+    app = Flask("stub_huggingface")
+    image = os.urandom(config.image_bytes)
+
+    @app.route("/models/<path:model>", methods=["POST"])
+    def inference(model):
+        if random.random() < config.hf_cold_rate:
+            return jsonify({"error": f"Model {model} is currently loading", "estimated_time": 20.0}), 503
+        time.sleep(config.hf_latency)
+        return Response(image, content_type="image/png")
+
+    return app
+
+
+def apply_filter(query, column, expression):
+    """Add one PostgREST filter (e.g. "eq.5", "in.(a,b)") to a LocalQuery"""
+    op, _, value = expression.partition(".")
+    if op == "in":
+        query.in_(column, [v.strip('"') for v in value.strip("()").split(",") if v])
+    elif op in ("eq", "gt", "lt"):
+        getattr(query, op)(column, value.strip('"'))
+    else:
+        raise ValueError(f"unsupported filter {column}={expression}")
+
+
+def make_supabase_app(config, path=None):
+    app = Flask("stub_supabase")
+    store = LocalClient(path or os.path.join(tempfile.mkdtemp(), "stub_supabase.json"))
+
+    @app.route("/rest/v1/<table>", methods=["GET", "POST", "PATCH", "DELETE"])
+    def rest(table):
+        time.sleep(config.db_latency)
+        query = store.table(table)
+        if request.method == "POST":
+            query.insert(request.get_json())
+        elif request.method == "PATCH":
+            query.update(request.get_json())
+        elif request.method == "DELETE":
+            query.delete()
+        else:
+            query.select(request.args.get("select", "*"))
+        for column, expression in request.args.items(multi=True):
+            if column == "or":
+                query.or_(expression.strip("()"))
+            elif column not in POSTGREST_PARAMS:
+                apply_filter(query, column, expression)
+        if "order" in request.args:
+            column, _, direction = request.args["order"].partition(".")
+            query.order(column, desc=direction.startswith("desc"))
+        if "limit" in request.args:
+            query.limit(int(request.args["limit"]))
+        try:
+            result = query.execute()
+        except LocalStoreError as e:
+            return jsonify({"code": e.code, "message": e.message, "details": e.details, "hint": None}), 409
+        return jsonify(result.data), 201 if request.method == "POST" else 200
+
+    return app
+
+
+def start_stubs(config):
+    """Serve the three stubs on free local ports; returns (servers, app environment)"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log line per stub call
+    servers = {
+        "openrouter": serve(make_openrouter_app(config)),
+        "huggingface": serve(make_huggingface_app(config)),
+        "supabase": serve(make_supabase_app(config)),
+    }
+    base = {name: f"http://127.0.0.1:{server.server_port}" for name, server in servers.items()}
+    env = {
+        "OPENROUTER_BASE_URL": f"{base['openrouter']}/api/v1",
+        "OPENROUTER_API_KEY": "stub",
+        "HUGGINGFACE_API_URL": base["huggingface"],
+        "HUGGINGFACE_TOKEN": "stub",
+        "SUPABASE_URL": base["supabase"],
+        "SUPABASE_KEY": STUB_SUPABASE_KEY,
+    }
+    return servers, env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    servers, env = start_stubs(StubConfig.from_args(args))
+    for name, value in env.items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+TOMBSTONE_TABLE = "chat_tombstones"
+# Deletions are remembered this long; a client whose list is older gets every chat id instead
+TOMBSTONE_TTL = timedelta(days=30)
+
+
+def tombstone_horizon(now=None):
+    """Epoch time before which tombstones are no longer kept"""
+    now = datetime.utcnow().timestamp() if now is None else now
+    return now - TOMBSTONE_TTL.total_seconds()
+
+
+def list_version(entries, deletions=()):
+    """Version token of a user's chat list: the chat count and the newest `updated` or deletion time.
+
+    Creating or touching a chat raises the newest time, and deleting one lowers the count and
+    leaves a newer tombstone, so any change to the stored list changes the token, whichever
+    worker made it.
+    """
+    newest = max([entry.get("updated") or 0 for entry in entries] +
+                 [deletion["deleted"] for deletion in deletions], default=0)
+    return f"{len(entries)}-{float(newest)!r}"
+
+
+def changes_since(entries, deletions, token, now=None):
+    """Chats changed since `token`: (changes, deleted, ids), or None if the token can't be read.
+
+    `changes` are the entries updated after the token's newest time and `deleted` the ids of
+    the chats whose tombstone is newer. `ids` is None unless a deletion may be missing from
+    the tombstones: the token predates the ones still kept, or it counted more chats than
+    are left plus those deleted. Then it lists every chat id, and clients drop the chats
+    missing from it.
+    """
+    count, _, newest = (token or "").partition("-")
+    try:
+        count, newest = int(count), float(newest)
+    except ValueError:
+        return None
+    changes = [entry for entry in entries if (entry.get("updated") or 0) > newest]
+    deleted = [deletion["chat_id"] for deletion in deletions if deletion["deleted"] > newest]
+    # Every chat the token counted is either still listed or has a tombstone
+    if count == 0 or (newest >= tombstone_horizon(now) and count <= len(entries) + len(deleted)):
+        return changes, deleted, None
+    return changes, deleted, [entry["chat_id"] for entry in entries]
@@ -2,6 +2,14 @@ import os
 import requests
 import base64
 
+from app_logging import get_logger
+from tracing import tracer
+
+# Overridable so the app can run against a local stand-in (benchmarks/stub_upstreams.py)
+HUGGINGFACE_API_URL = os.getenv("HUGGINGFACE_API_URL", "https://api-inference.huggingface.co")
+
+log = get_logger("images")
+
 class FreeImageModels:
     def __init__(self):
         self.models = {
@@ -21,22 +29,24 @@ class FreeImageModels:
             model_name = "flux"
         
         model = self.models[model_name]
-        url = f"https://api-inference.huggingface.co/models/{model}"
+        url = f"{HUGGINGFACE_API_URL}/models/{model}"
         
-        headers = {"Authorization": f"Bearer ${secrets.HUGGINGFACE}"}
+        headers = tracer.inject({"Authorization": f"Bearer {os.getenv('HUGGINGFACE_TOKEN')}"})
 
         try:
-            response = requests.post(url, headers=headers, json={"inputs": prompt}, timeout=120)
+            with tracer.span("huggingface", model=model_name) as span:
+                response = requests.post(url, headers=headers, json={"inputs": prompt}, timeout=120)
+                span.set(status=response.status_code, bytes=len(response.content))
             
             if response.status_code == 200:
                 image_data = response.content
                 return base64.b64encode(image_data).decode('utf-8')
             else:
-                print(f"Model {model_name} failed: {response.status_code}")
+                log.warning("image_generation_failed", model=model_name, status=response.status_code)
                 return None
                 
         except Exception as e:
-            print(f"Error with {model_name}: {str(e)}")
+            log.error("image_generation_error", model=model_name, error=str(e))
             return None
 
 # Create instance with correct name
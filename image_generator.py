@@ -3,9 +3,16 @@ import requests
 import base64
 import time
 
+from app_logging import get_logger
+from tracing import tracer
+
+HUGGINGFACE_API_URL = os.getenv("HUGGINGFACE_API_URL", "https://api-inference.huggingface.co")
+
+log = get_logger("images")
+
 class ImageService:
     def __init__(self):
-        self.token = ${secrets.HUGGINGFACE}
+        self.token = os.getenv("HUGGINGFACE_TOKEN")
         self.models = {
             "stable_diffusion": "runwayml/stable-diffusion-v1-5",
             "flux": "black-forest-labs/FLUX.1-schnell",
@@ -16,63 +23,59 @@ class ImageService:
         """Generate image from prompt with detailed debugging"""
         try:
             if not self.token:
-                print("❌ HUGGINGFACE_TOKEN not found in environment variables")
+                log.error("image_token_missing", variable="HUGGINGFACE_TOKEN")
                 return None
             
             if model not in self.models:
                 model = "flux"
             
             model_id = self.models[model]
-            url = f"https://api-inference.huggingface.co/models/{model_id}"
-            headers = {"Authorization": f"Bearer {self.token}"}
+            url = f"{HUGGINGFACE_API_URL}/models/{model_id}"
+            headers = tracer.inject({"Authorization": f"Bearer {self.token}"})
             
-            print(f"🎨 Attempting to generate image...")
-            print(f"   Model: {model} ({model_id})")
-            print(f"   Prompt: {prompt}")
-            print(f"   Token: {self.token[:10]}...")  # Show first 10 chars of token
+            log.debug("image_request", model=model, model_id=model_id, prompt=prompt)
             
             # Make request with longer timeout
-            response = requests.post(
-                url, 
-                headers=headers, 
-                json={"inputs": prompt}, 
-                timeout=120  # 2 minute timeout
-            )
-            
-            print(f"📡 Response Status: {response.status_code}")
+            with tracer.span("huggingface", model=model) as span:
+                response = requests.post(
+                    url, 
+                    headers=headers, 
+                    json={"inputs": prompt}, 
+                    timeout=120  # 2 minute timeout
+                )
+                span.set(status=response.status_code, bytes=len(response.content))
             
             if response.status_code == 200:
                 image_data = response.content
                 if len(image_data) > 100:  # Check if we got actual image data
                     image_b64 = base64.b64encode(image_data).decode('utf-8')
-                    print("✅ Image generated successfully!")
-                    print(f"   Image size: {len(image_data)} bytes")
+                    log.info("image_generated", model=model, bytes=len(image_data))
                     return image_b64
                 else:
-                    print("❌ Received empty or invalid image data")
+                    log.warning("image_empty", model=model, bytes=len(image_data))
                     return None
                     
             elif response.status_code == 503:
-                print("❌ Model is loading, please try again in 30 seconds")
+                log.warning("image_model_loading", model=model)
                 return None
             elif response.status_code == 401:
-                print("❌ Invalid Hugging Face token")
+                log.error("image_token_invalid", model=model)
                 return None
             elif response.status_code == 404:
-                print("❌ Model not found")
+                log.error("image_model_not_found", model=model, model_id=model_id)
                 return None
             else:
-                print(f"❌ API Error {response.status_code}: {response.text[:200]}")
+                log.error("image_api_error", model=model, status=response.status_code, body=response.text[:200])
                 return None
                 
         except requests.exceptions.Timeout:
-            print("❌ Request timeout - model might be loading")
+            log.warning("image_timeout", model=model)
             return None
         except requests.exceptions.ConnectionError:
-            print("❌ Connection error - check internet connection")
+            log.error("image_connection_error", model=model)
             return None
         except Exception as e:
-            print(f"❌ Unexpected error: {str(e)}")
+            log.exception("image_unexpected_error", model=model, error=str(e))
             return None
 
 # Create global instance
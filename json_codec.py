@@ -0,0 +1,63 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json
+    orjson = None
+
+
+def _orjson_dumpb(obj, sort_keys=False, default=None):
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=option)
+
+
+def dumpb(obj, sort_keys=False, default=None):
+    """Compact UTF-8 JSON bytes, via orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return _orjson_dumpb(obj, sort_keys, default)
+        except TypeError:
+            pass  # e.g. integers wider than 64 bits; the stdlib encoder handles them
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys,
+                      default=default).encode("utf-8")
+
+
+def dumps(obj, sort_keys=False, default=None):
+    """Compact JSON text"""
+    return dumpb(obj, sort_keys, default).decode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the work when it is installed.
+
+    Output matches DefaultJSONProvider's compact form (sorted keys, dates as HTTP dates,
+    Decimal/UUID/dataclass support through its default()) apart from non-ASCII text being
+    written as UTF-8 instead of \\u escapes. Debug-mode pretty printing and calls with
+    json.dumps keyword arguments fall back to the stdlib path.
+    """
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumpb(obj, self.sort_keys, self.default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumpb(obj, self.sort_keys, self.default) + b"\n", mimetype=self.mimetype)
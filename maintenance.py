@@ -0,0 +1,196 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from app_logging import get_logger
+from chat_sync import tombstone_horizon, TOMBSTONE_TABLE
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker runs its own janitor
+    fcntl = None
+
+DEFAULT_INTERVAL = 3600     # seconds between maintenance runs
+DEFAULT_BATCH_SIZE = 500    # rows per select/delete round trip
+EMPTY_CHAT_TTL = timedelta(days=1)
+# Seconds of already purged tombstones re-read on each orphan purge, for ones another worker
+# wrote with a slightly older time
+TOMBSTONE_OVERLAP = 300
+# Host-wide lock so one worker per host runs maintenance; by default in the temp directory,
+# named after the working directory so separate deployments on one host don't share it
+LOCK_FILE = os.getenv("JANITOR_LOCK_FILE")
+
+log = get_logger("janitor")
+
+
+def default_lock_file():
+    deployment = hashlib.sha1(os.getcwd().encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"janitor-{deployment}.lock")
+
+
+class Janitor:
+    """Periodically purges expired reset and refresh tokens, orphaned messages, stale local chats
+    and chat tombstones past their TTL"""
+    def __init__(self, get_client, get_local_chats, save_local_chats, interval=DEFAULT_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE, local_retention_days=None, lock_file=LOCK_FILE):
+        self.get_client = get_client
+        self.get_local_chats = get_local_chats
+        self.save_local_chats = save_local_chats
+        self.interval = interval
+        self.batch_size = batch_size
+        self.local_retention = timedelta(days=local_retention_days) if local_retention_days else None
+        self.lock_file = lock_file
+        self.start_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_run = {}
+        self.tombstone_cursor = None  # newest tombstone whose messages were purged
+
+    def purge_reset_tokens(self):
+        """Delete expired or used password reset tokens in batches"""
+        client = self.get_client()
+        now = datetime.utcnow().isoformat()
+        removed = 0
+        while True:
+            rows = client.table("password_reset_tokens").select("id").or_(
+                f"expires_at.lt.{now},used.eq.true").limit(self.batch_size).execute().data or []
+            if not rows:
+                return removed
+            client.table("password_reset_tokens").delete().in_("id", [r["id"] for r in rows]).execute()
+            removed += len(rows)
+            if len(rows) < self.batch_size:
+                return removed
+
+    def purge_refresh_tokens(self):
+        """Delete records of expired refresh tokens in batches"""
+        client = self.get_client()
+        now = datetime.utcnow().isoformat()
+        removed = 0
+        while True:
+            rows = client.table("refresh_tokens").select("jti").lt(
+                "expires_at", now).limit(self.batch_size).execute().data or []
+            if not rows:
+                return removed
+            client.table("refresh_tokens").delete().in_("jti", [r["jti"] for r in rows]).execute()
+            removed += len(rows)
+            if len(rows) < self.batch_size:
+                return removed
+
+    def purge_orphaned_messages(self):
+        """Delete messages of deleted chats, found through the chat tombstones written since the
+        last run (all those kept after a restart), rather than by scanning the messages table"""
+        client = self.get_client()
+        newest = self.tombstone_cursor
+        cursor = tombstone_horizon() if newest is None else newest - TOMBSTONE_OVERLAP
+        removed = 0
+        while True:
+            rows = client.table(TOMBSTONE_TABLE).select("chat_id, deleted").gt("deleted", cursor).order(
+                "deleted").limit(self.batch_size).execute().data or []
+            if not rows:
+                break
+            deleted = client.table("messages").delete().in_(
+                "conversation_id", [r["chat_id"] for r in rows]).execute().data or []
+            removed += len(deleted)
+            cursor = newest = rows[-1]["deleted"]
+            if len(rows) < self.batch_size:
+                break
+        self.tombstone_cursor = newest
+        return removed
+
+    def purge_local_chats(self):
+        """Drop local fallback chats that were never used, or are past the retention period"""
+        chats = self.get_local_chats()
+        now = datetime.utcnow().timestamp()
+        # The store's lock is the one request handlers hold while changing and saving chats
+        with chats.lock:
+            stale = []
+            for chat_id, chat in list(chats.items()):
+                age = now - (chat.get("updated") or 0)
+                unused = not any(m.get("role") == "user" for m in chat.get("messages", []))
+                if (unused and age > EMPTY_CHAT_TTL.total_seconds()) or (
+                        self.local_retention and age > self.local_retention.total_seconds()):
+                    stale.append(chat_id)
+            removed = {chat_id: chats.pop(chat_id) for chat_id in stale if chat_id in chats}
+            if removed:
+                self.save_local_chats()
+        if removed:
+            # Tombstones let clients syncing their chat list drop these chats too
+            deleted = datetime.utcnow().timestamp()
+            try:
+                self.get_client().table(TOMBSTONE_TABLE).insert([
+                    {"chat_id": chat_id, "user_id": chat.get("user_id"), "deleted": deleted}
+                    for chat_id, chat in removed.items()]).execute()
+            except Exception as e:
+                log.warning("chat_tombstone_failed", chats=len(removed), error=str(e))
+        return len(removed)
+
+    def purge_chat_tombstones(self):
+        """Delete chat tombstones older than the tombstone TTL in batches"""
+        client = self.get_client()
+        horizon = tombstone_horizon()
+        removed = 0
+        while True:
+            rows = client.table(TOMBSTONE_TABLE).select("chat_id").lt(
+                "deleted", horizon).limit(self.batch_size).execute().data or []
+            if not rows:
+                return removed
+            client.table(TOMBSTONE_TABLE).delete().in_("chat_id", [r["chat_id"] for r in rows]).execute()
+            removed += len(rows)
+            if len(rows) < self.batch_size:
+                return removed
+
+    def run_once(self):
+        """Run every task once; a failing task doesn't stop the others"""
+        for name, task in (("reset_tokens", self.purge_reset_tokens),
+                           ("refresh_tokens", self.purge_refresh_tokens),
+                           ("orphaned_messages", self.purge_orphaned_messages),
+                           ("local_chats", self.purge_local_chats),
+                           ("chat_tombstones", self.purge_chat_tombstones)):
+            started = time.monotonic()
+            try:
+                removed = task()
+                self.last_run[name] = {"removed": removed, "seconds": round(time.monotonic() - started, 3),
+                                       "at": datetime.utcnow().isoformat()}
+                if removed:
+                    log.info("janitor_purged", task=name, removed=removed)
+            except Exception as e:
+                self.last_run[name] = {"error": str(e), "at": datetime.utcnow().isoformat()}
+                log.error("janitor_task_failed", task=name, error=str(e))
+
+    def _run(self):
+        lock = self._acquire_host_lock()
+        if lock is False:
+            return  # another worker on this host is the janitor
+        # First run at start, so a host that restarts more often than the interval still purges
+        while True:
+            self.run_once()
+            if self.stop_event.wait(self.interval):
+                return
+
+    def _acquire_host_lock(self):
+        """Hold an exclusive lock file so only one worker per host runs maintenance"""
+        if fcntl is None:
+            return None
+        handle = open(self.lock_file or default_lock_file(), "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        return handle  # kept open for the life of the thread
+
+    def start(self):
+        """Start the background thread (and take the host lock); safe to call on every request"""
+        if self.interval <= 0 or self.thread is not None:
+            return
+        with self.start_lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
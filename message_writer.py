@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+
+from app_logging import get_logger
+
+DEFAULT_FLUSH_INTERVAL = 0.01   # seconds a message may wait before its batch is written
+DEFAULT_TOUCH_INTERVAL = 1.0    # seconds between conversations.updated bumps
+DEFAULT_MAX_BATCH = 200
+DEFAULT_MAX_RETRIES = 5
+PENDING_FILE = "pending_messages.jsonl"
+
+log = get_logger("message_writer")
+
+
+class MessageWriter:
+    """Write-behind buffer that batches message inserts and conversation timestamp updates.
+
+    Messages are written with one bulk insert per flush. conversations.updated bumps (the
+    epoch time the chat list and ETags read) are coalesced per conversation and written once
+    per touch interval, each conversation getting its own last message time. Inserts and touches are retried separately: a failed insert is
+    retried with backoff and spilled to PENDING_FILE if it keeps failing, to be replayed on the
+    next start, while a failed touch is kept for the next touch interval. The thread (and the
+    replay) starts with the first message, so creating a writer costs nothing at import time.
+    """
+    def __init__(self, get_client, flush_interval=DEFAULT_FLUSH_INTERVAL, touch_interval=DEFAULT_TOUCH_INTERVAL,
+                 max_batch=DEFAULT_MAX_BATCH, max_retries=DEFAULT_MAX_RETRIES, pending_file=PENDING_FILE):
+        self.get_client = get_client
+        self.flush_interval = flush_interval
+        self.touch_interval = touch_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.pending_file = pending_file
+        self.cond = threading.Condition()
+        self.messages = []
+        self.touches = {}  # conversation_id -> latest message time (epoch seconds)
+        self.last_touch = 0.0
+        self.failures = 0
+        self.closed = False
+        self.stats = {"messages": 0, "flushes": 0, "round_trips": 0, "retries": 0, "spilled": 0}
+        self.thread = None
+
+    def start(self):
+        """Replay spilled messages and start the background thread; called by the first add()"""
+        with self.cond:
+            if self.thread is not None:
+                return
+            self._load_pending()
+            self.thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+            self.thread.start()
+        atexit.register(self.close)
+
+    def add(self, conversation_id, role, content):
+        """Queue a message; it is persisted within flush_interval"""
+        if self.thread is None:
+            self.start()
+        created = datetime.utcnow()
+        record = {
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "created_at": created.isoformat(),
+        }
+        with self.cond:
+            self.messages.append(record)
+            self.touches[conversation_id] = created.timestamp()
+            self.stats["messages"] += 1
+            if len(self.messages) == 1 or len(self.messages) >= self.max_batch:
+                self.cond.notify()
+        return record
+
+    def _touch_wait(self):
+        """Seconds until pending touches are due, or None if there are none"""
+        if not self.touches:
+            return None
+        return max(0.0, self.touch_interval - (time.monotonic() - self.last_touch))
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.closed and not self.messages and self._touch_wait() != 0.0:
+                    self.cond.wait(self._touch_wait())
+                if self.closed:
+                    return
+                if self.messages and len(self.messages) < self.max_batch:
+                    # Let the batch fill up for a moment
+                    self.cond.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self, force_touch=False):
+        """Write everything that is due; returns False if a batch failed and was kept"""
+        with self.cond:
+            batch, self.messages = self.messages, []
+            touches = {}
+            if self.touches and (force_touch or time.monotonic() - self.last_touch >= self.touch_interval):
+                touches, self.touches = self.touches, {}
+        if not batch and not touches:
+            return True
+        try:
+            client = self.get_client()
+        except Exception as e:
+            self._retouch(touches)
+            if batch:
+                self._requeue(batch, e)
+            else:
+                log.warning("conversation_touch_failed", conversations=len(touches), error=str(e))
+            return False
+        if batch:
+            try:
+                client.table("messages").insert(batch).execute()
+            except Exception as e:
+                # Touches wait for their messages, so a conversation never looks newer than its rows
+                self._retouch(touches)
+                self._requeue(batch, e)
+                return False
+            self.stats["round_trips"] += 1
+            self.failures = 0
+        self.stats["flushes"] += 1
+        return self._write_touches(client, touches) if touches else True
+
+    def _write_touches(self, client, touches):
+        """Set each conversation's updated to its own last message time, with one update per
+        distinct timestamp; conversations whose update failed are kept for the next interval"""
+        by_time = {}
+        for conversation_id, ts in touches.items():
+            by_time.setdefault(ts, []).append(conversation_id)
+        failed = {}
+        for ts, conversation_ids in by_time.items():
+            try:
+                client.table("conversations").update({"updated": ts}).in_("id", conversation_ids).execute()
+                self.stats["round_trips"] += 1
+            except Exception as e:
+                log.warning("conversation_touch_failed", conversations=len(conversation_ids), error=str(e))
+                failed.update((conversation_id, ts) for conversation_id in conversation_ids)
+        self._retouch(failed)
+        return not failed
+
+    def _retouch(self, touches):
+        """Keep touches that were not written, without moving a newer pending one back"""
+        with self.cond:
+            for conversation_id, ts in touches.items():
+                self.touches[conversation_id] = max(ts, self.touches.get(conversation_id, ts))
+            # Whether written or not, the next attempt waits a full touch interval
+            self.last_touch = time.monotonic()
+
+    def _requeue(self, batch, error):
+        """Put a failed insert back at the front, or spill it to disk after max_retries"""
+        self.failures += 1
+        log.warning("message_flush_failed", messages=len(batch), attempt=self.failures, error=str(error))
+        with self.cond:
+            if self.failures > self.max_retries:
+                self._spill(batch)
+                self.failures = 0
+            else:
+                self.messages[:0] = batch
+                self.stats["retries"] += 1
+        # Back off without holding the lock so add() stays fast
+        time.sleep(min(2.0, self.flush_interval * (2 ** self.failures)))
+
+    def _spill(self, batch):
+        try:
+            with open(self.pending_file, "a", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stats["spilled"] += len(batch)
+        except Exception as e:
+            log.error("message_spill_failed", lost=len(batch), error=str(e))
+
+    def _load_pending(self):
+        """Requeue messages spilled by an earlier process"""
+        if not os.path.exists(self.pending_file):
+            return
+        try:
+            with open(self.pending_file, "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.pending_file)
+        except Exception as e:
+            log.error("pending_messages_load_failed", error=str(e))
+            return
+        self.messages.extend(records)
+        for record in records:
+            ts = datetime.fromisoformat(record["created_at"]).timestamp()
+            self.touches[record["conversation_id"]] = max(ts, self.touches.get(record["conversation_id"], ts))
+
+    def close(self):
+        """Stop the background thread and write out everything still buffered"""
+        with self.cond:
+            if self.closed or self.thread is None:
+                return
+            self.closed = True
+            self.cond.notify()
+        self.thread.join(timeout=5)
+        for _ in range(self.max_retries + 1):
+            if self.flush(force_touch=True) and not self.messages and not self.touches:
+                return
+        if self.messages:
+            with self.cond:
+                batch, self.messages = self.messages, []
+            self._spill(batch)
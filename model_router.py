@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+import requests
+
+from app_logging import get_logger
+
+# Models the router may pick from; MODEL in app1.py stays the default fast choice.
+# cost is USD per 1M completion tokens, max_prompt_chars a conservative context budget.
+DEFAULT_MODELS = [
+    {"id": "openai/gpt-4o-mini", "tier": "fast", "cost": 0.6, "max_prompt_chars": 400000},
+    {"id": "openai/gpt-4o", "tier": "quality", "cost": 10.0, "max_prompt_chars": 400000},
+    {"id": "anthropic/claude-3.5-sonnet", "tier": "quality", "cost": 15.0, "max_prompt_chars": 600000},
+]
+TIERS = ("fast", "quality")
+log = get_logger("model_router")
+SAMPLES = 500
+# Assumed numbers for a model with no observations yet, so it still gets tried
+PRIOR_LATENCY = 2.0
+PRIOR_TOKENS_PER_SEC = 50.0
+EXPECTED_REPLY_TOKENS = 400
+# Seconds of expected latency one USD per 1M tokens is worth when ranking
+COST_WEIGHT = 0.05
+EWMA_ALPHA = 0.2
+# Client errors another model may not hit: request timeout and rate limiting
+RETRYABLE_4XX = (408, 429)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class UpstreamResponseError(Exception):
+    """A 2xx response whose body couldn't be decoded; another model may answer properly"""
+
+
+def is_retryable(error):
+    """True for failures another model might not have: timeouts, connection errors,
+    5xx, 408, 429 and undecodable 2xx bodies. Missing configuration and other 4xx fail
+    the same everywhere."""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, UpstreamResponseError)):
+        return True
+    response = getattr(error, "response", None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        return response.status_code >= 500 or response.status_code in RETRYABLE_4XX
+    return False
+
+
+class ModelStats:
+    """Rolling latency and throughput observations for one model"""
+    def __init__(self):
+        self.latencies = deque(maxlen=SAMPLES)
+        self.tokens_per_sec = deque(maxlen=SAMPLES)
+        self.latency_ewma = None
+        self.tps_ewma = None
+        self.requests = 0
+        self.errors = 0
+
+    def record_success(self, latency, completion_tokens):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.latency_ewma = latency if self.latency_ewma is None else (
+            EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency_ewma)
+        if completion_tokens and latency > 0:
+            tps = completion_tokens / latency
+            self.tokens_per_sec.append(tps)
+            self.tps_ewma = tps if self.tps_ewma is None else (
+                EWMA_ALPHA * tps + (1 - EWMA_ALPHA) * self.tps_ewma)
+
+    def record_error(self):
+        self.requests += 1
+        self.errors += 1
+
+    def expected_latency(self, reply_tokens):
+        """Estimated seconds for a reply of `reply_tokens` tokens"""
+        tps = self.tps_ewma or PRIOR_TOKENS_PER_SEC
+        base = self.latency_ewma if self.latency_ewma is not None else PRIOR_LATENCY
+        # latency_ewma already includes a typical reply; scale only the generation part
+        return base + max(0, reply_tokens - EXPECTED_REPLY_TOKENS) / tps
+
+    def error_rate(self):
+        return self.errors / self.requests if self.requests else 0.0
+
+    def snapshot(self):
+        p50 = _percentile(self.latencies, 50)
+        p95 = _percentile(self.latencies, 95)
+        tps = _percentile(self.tokens_per_sec, 50)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "tokens_per_sec_p50": round(tps, 1) if tps is not None else None,
+        }
+
+
+class ModelRouter:
+    """Picks an OpenRouter model per request from prompt length, tier and observed latency"""
+    def __init__(self, models=None):
+        self.models = models or DEFAULT_MODELS
+        self.lock = threading.Lock()
+        self.stats = {m["id"]: ModelStats() for m in self.models}
+
+    def candidates(self, prompt_chars, tier="fast"):
+        """Models able to take the prompt, best first; other tiers follow as fallbacks"""
+        if tier not in TIERS:
+            tier = "fast"
+        reply_tokens = EXPECTED_REPLY_TOKENS + prompt_chars // 40
+        with self.lock:
+            def score(model):
+                stats = self.stats[model["id"]]
+                # Penalise flaky models so a failing one drifts to the back
+                return (stats.expected_latency(reply_tokens) * (1 + 4 * stats.error_rate())
+                        + model["cost"] * COST_WEIGHT)
+            fitting = [m for m in self.models if m["max_prompt_chars"] >= prompt_chars]
+            preferred = sorted((m for m in fitting if m["tier"] == tier), key=score)
+            others = sorted((m for m in fitting if m["tier"] != tier), key=score)
+        return [m["id"] for m in preferred + others]
+
+    def record(self, model_id, latency, completion_tokens=None, error=False):
+        with self.lock:
+            stats = self.stats.setdefault(model_id, ModelStats())
+            if error:
+                stats.record_error()
+            else:
+                stats.record_success(latency, completion_tokens)
+
+    def complete(self, messages, send, tier="fast"):
+        """Call send(model_id) on each candidate until one succeeds; return (model_id, data).
+
+        Only retryable errors fail over to the next model; anything else is raised at once
+        without counting against the model."""
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        last_error = None
+        for model_id in self.candidates(prompt_chars, tier):
+            started = time.monotonic()
+            try:
+                data = send(model_id)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.record(model_id, time.monotonic() - started, error=True)
+                log.warning("model_failed", model=model_id, error=str(e))
+                last_error = e
+                continue
+            usage = (data.get("usage") or {}) if isinstance(data, dict) else {}
+            self.record(model_id, time.monotonic() - started, usage.get("completion_tokens"))
+            return model_id, data
+        if last_error is not None:
+            raise last_error
+        raise ValueError("No configured model can handle this prompt")
+
+    def snapshot(self):
+        """Per-model p50/p95 latency and tokens/sec"""
+        with self.lock:
+            return {
+                m["id"]: dict(self.stats[m["id"]].snapshot(), tier=m["tier"], cost=m["cost"])
+                for m in self.models
+            }
+
+
+def validate_models(models):
+    """Raise ValueError unless models is a non-empty list of well-formed, uniquely named entries"""
+    if not isinstance(models, list) or not models:
+        raise ValueError("OPENROUTER_MODELS must be a non-empty JSON list")
+    seen = set()
+    for model in models:
+        if not isinstance(model, dict):
+            raise ValueError(f"OPENROUTER_MODELS entries must be objects, got {model!r}")
+        model_id = model.get("id")
+        if not isinstance(model_id, str) or not model_id.strip():
+            raise ValueError(f"OPENROUTER_MODELS entry has an empty id: {model!r}")
+        if model_id in seen:
+            raise ValueError(f"OPENROUTER_MODELS lists {model_id} more than once")
+        seen.add(model_id)
+        if model.get("tier") not in TIERS:
+            raise ValueError(f"OPENROUTER_MODELS entry {model_id} needs a tier from {TIERS}")
+        for field in ("cost", "max_prompt_chars"):
+            value = model.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"OPENROUTER_MODELS entry {model_id} needs a numeric {field}")
+    return models
+
+
+def load_models():
+    """Models from OPENROUTER_MODELS (a JSON list like DEFAULT_MODELS), else the defaults.
+    A malformed list is rejected at startup rather than on the first chat."""
+    raw = os.getenv("OPENROUTER_MODELS")
+    if not raw:
+        return DEFAULT_MODELS
+    try:
+        models = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"OPENROUTER_MODELS is not valid JSON: {e}") from None
+    return validate_models(models)
+
+# Create global instance
+
+model_router = ModelRouter(load_models())
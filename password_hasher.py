@@ -0,0 +1,116 @@
+import os
+import hmac
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import get_logger
+
+# scrypt cost parameters; raising any of them makes old hashes get upgraded on next login
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+SALT_BYTES = 16
+HASH_BYTES = 32
+PREFIX = "scrypt"
+# Hash jobs allowed to wait for a pool thread before callers are turned away
+QUEUE_PER_WORKER = 8
+QUEUE_TIMEOUT = 5
+
+log = get_logger("passwords")
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+class PasswordHasher:
+    """scrypt password hashing on a bounded thread pool.
+
+    hashlib.scrypt releases the GIL, so hashing runs in parallel with request threads
+    instead of stalling them, and the pool size caps the CPU spent on logins.
+    """
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, workers=None):
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers or int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.slots = threading.BoundedSemaphore(self.workers * QUEUE_PER_WORKER)
+        self._dummy_hash = None
+
+    @property
+    def dummy_hash(self):
+        """Verified against when a user doesn't exist, so response time doesn't reveal it"""
+        if self._dummy_hash is None:
+            self._dummy_hash = self._hash(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def _scrypt(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * (n + p + 2), dklen=HASH_BYTES)
+
+    def _hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        digest = self._scrypt(password, salt, self.n, self.r, self.p)
+        return f"{PREFIX}${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    def _verify(self, password, stored):
+        if not stored or not stored.startswith(PREFIX + "$"):
+            # Legacy plaintext row: compare in constant time, then upgrade it
+            ok = hmac.compare_digest((stored or "").encode("utf-8"), password.encode("utf-8"))
+            return ok, ok
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            n, r, p = int(n), int(r), int(p)
+            expected = base64.b64decode(digest)
+            actual = self._scrypt(password, base64.b64decode(salt), n, r, p)
+        except ValueError:
+            return False, False
+        ok = hmac.compare_digest(actual, expected)
+        # Upgrade only hashes weaker than the current settings; lowering them never weakens old ones
+        weaker = n <= self.n and r <= self.r and p <= self.p and (n, r, p) != (self.n, self.r, self.p)
+        return ok, ok and weaker
+
+    def _submit(self, fn, *args):
+        if not self.slots.acquire(timeout=QUEUE_TIMEOUT):
+            raise HashingBusy("Password hashing is saturated, try again shortly")
+        try:
+            future = self.pool.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def hash(self, password):
+        """Encoded scrypt hash of a password"""
+        return self._submit(self._hash, password).result()
+
+    def verify(self, password, stored):
+        """(matches, needs_rehash) for a password against a stored hash"""
+        return self._submit(self._verify, password, stored or self.dummy_hash).result()
+
+    def verify_missing_user(self, password):
+        """Spend the same time as a real verify when the account doesn't exist"""
+        self.verify(password, self.dummy_hash)
+        return False
+
+    def rehash_later(self, password, save):
+        """Hash with current parameters in the pool and pass the result to save(), off the request path"""
+        def job():
+            try:
+                save(self._hash(password))
+            except Exception as e:
+                log.error("password_rehash_failed", error=str(e))
+        try:
+            self._submit(job)
+        except HashingBusy:
+            pass  # upgrade again on a later login
+
+# Create global instance
+
+password_hasher = PasswordHasher()
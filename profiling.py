@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import pstats
+import signal
+import cProfile
+import threading
+from collections import Counter
+
+from app_logging import get_logger
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+DEFAULT_INTERVAL = 0.01
+MAX_SECONDS = 120
+MIN_INTERVAL = 0.001
+
+log = get_logger("profiling")
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already running in this worker"""
+
+
+def frame_label(frame):
+    code = frame.f_code
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for a live worker.
+
+    A thread snapshots every other thread's stack at a fixed interval and counts identical
+    stacks. Nothing is hooked into the profiled code, so the cost is the sampling loop
+    itself, and it only runs while a profile is being taken. Output is the collapsed-stack
+    format read by flamegraph.pl, speedscope and inferno, rooted at the thread name.
+    """
+    def __init__(self, directory=PROFILE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def sample(self, seconds, interval=DEFAULT_INTERVAL):
+        """Sample for `seconds`; returns (Counter of collapsed stacks, number of samples)"""
+        seconds = max(0.0, min(float(seconds), MAX_SECONDS))
+        interval = max(MIN_INTERVAL, float(interval))
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            stacks = Counter()
+            me = threading.get_ident()
+            names = {}
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frames = sys._current_frames()
+                if any(ident not in names for ident in frames):
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                    stacks[";".join(reversed(stack))] += 1
+                samples += 1
+                time.sleep(interval)
+            return stacks, samples
+        finally:
+            self.lock.release()
+
+    def collapsed(self, seconds, interval=DEFAULT_INTERVAL):
+        """Profile for `seconds` and return it as collapsed-stack text"""
+        stacks, samples = self.sample(seconds, interval)
+        log.info("sampling_profile_taken", seconds=seconds, interval=interval, samples=samples,
+                 stacks=len(stacks))
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def collapsed_to_file(self, seconds, interval=DEFAULT_INTERVAL):
+        """Profile for `seconds` and write it to the profile directory; returns the path"""
+        text = self.collapsed(seconds, interval)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"sampled-{os.getpid()}-{int(time.time())}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        log.info("sampling_profile_saved", path=path)
+        return path
+
+    def install_signal(self, signame, seconds):
+        """Take a `seconds` profile into the profile directory whenever the signal arrives.
+
+        Must be called from the main thread; the profile itself runs on a new thread.
+        """
+        def handler(signum, frame):
+            threading.Thread(target=self._profile_quietly, args=(seconds,), name="signal-profiler",
+                             daemon=True).start()
+        signal.signal(getattr(signal, signame), handler)
+        log.info("profile_signal_installed", signal=signame, seconds=seconds)
+
+    def _profile_quietly(self, seconds):
+        try:
+            self.collapsed_to_file(seconds)
+        except ProfilerBusy:
+            log.warning("profile_busy")
+        except Exception as e:
+            log.error("profile_failed", error=str(e))
+
+
+class RequestProfiler:
+    """cProfile around a single request, opted into per request.
+
+    Deterministic profiling is expensive, so only one request per worker is profiled at a
+    time; the stats are saved as a .prof file (pstats/snakeviz) and the slowest functions
+    are logged.
+    """
+    def __init__(self, directory=PROFILE_DIR, top=20):
+        self.directory = directory
+        self.top = top
+        self.lock = threading.Lock()
+
+    def start(self):
+        """A running cProfile.Profile, or None if another request is being profiled"""
+        if not self.lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except Exception:
+            self.lock.release()
+            raise
+        return profile
+
+    def finish(self, profile, name, **fields):
+        """Stop `profile`, save it as <name>.prof and log its top functions; returns the path"""
+        try:
+            profile.disable()
+        finally:
+            self.lock.release()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.prof")
+        profile.dump_stats(path)
+        stats = pstats.Stats(profile)
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+        log.info("request_profile", path=path, top=[
+            {"function": f"{func[2]} ({os.path.basename(func[0])}:{func[1]})",
+             "calls": calls, "total_ms": round(total * 1000, 2), "cumulative_ms": round(cumulative * 1000, 2)}
+            for func, (_, calls, total, cumulative, _) in top
+        ], **fields)
+        return path
+
+
+# Create global instances
+
+sampling_profiler = SamplingProfiler()
+request_profiler = RequestProfiler()
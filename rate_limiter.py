@@ -0,0 +1,210 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Requests allowed per window, keyed by Flask endpoint name: (count, seconds)
+DEFAULT_ENDPOINT_LIMITS = {
+    "chat": (20, 60),
+    "generate_image": (5, 60),
+}
+# Budget shared by every protected endpoint for one user
+DEFAULT_USER_LIMIT = (120, 60)
+# Max concurrent calls to each upstream provider, across all users
+DEFAULT_UPSTREAM_LIMITS = {
+    "openrouter": 8,
+    "huggingface": 2,
+}
+# A slot held longer than this is considered leaked (crashed worker)
+SLOT_LEASE_SECONDS = 300
+# Backoff while waiting for a slot another worker holds
+SLOT_POLL_INTERVAL = 0.05
+SLOT_POLL_MAX_INTERVAL = 1.0
+
+
+class UpstreamBusy(Exception):
+    """Raised when an upstream provider is already at its concurrency cap"""
+    def __init__(self, upstream, retry_after=1):
+        super().__init__(f"{upstream} is at capacity, retry in {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def parse_limit(value):
+    """Parse '20/60' into (20, 60.0)"""
+    count, _, seconds = value.partition("/")
+    return int(count), float(seconds or 60)
+
+
+def parse_limits(value):
+    """Parse 'chat=20/60;generate_image=5/60' into a dict of limits"""
+    limits = {}
+    for part in (value or "").split(";"):
+        if "=" in part:
+            name, limit = part.split("=", 1)
+            limits[name.strip()] = parse_limit(limit.strip())
+    return limits
+
+
+def _refill(tokens, updated, now, count, seconds):
+    """Return the token count after refilling since `updated`"""
+    rate = count / seconds
+    return min(float(count), tokens + (now - updated) * rate)
+
+
+def _retry_after(tokens, count, seconds, cost=1):
+    """Seconds until the bucket holds `cost` tokens again"""
+    rate = count / seconds
+    return max(1, int((cost - tokens) / rate + 0.999))
+
+
+class MemoryBucketStore:
+    """Keeps buckets and upstream slots in this process"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.slots = {}
+
+    def consume(self, key, count, seconds, cost=1):
+        """Take `cost` tokens from a bucket; return None or seconds to wait"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (float(count), now))
+            tokens = _refill(tokens, updated, now, count, seconds)
+            if tokens < cost:
+                self.buckets[key] = (tokens, now)
+                return _retry_after(tokens, count, seconds, cost)
+            self.buckets[key] = (tokens - cost, now)
+            return None
+
+    def acquire_slot(self, upstream, limit):
+        with self.lock:
+            in_flight = self.slots.get(upstream, 0)
+            if in_flight >= limit:
+                return None
+            self.slots[upstream] = in_flight + 1
+            return upstream
+
+    def release_slot(self, upstream, lease):
+        with self.lock:
+            self.slots[upstream] = max(0, self.slots.get(upstream, 0) - 1)
+
+
+class SQLiteBucketStore:
+    """Keeps buckets and upstream slots in a local SQLite file shared by all workers on the host"""
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS slots (lease TEXT PRIMARY KEY, upstream TEXT, expires REAL)")
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def consume(self, key, count, seconds, cost=1):
+        """Take `cost` tokens from a bucket; return None or seconds to wait"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (float(count), now)
+            tokens = _refill(tokens, updated, now, count, seconds)
+            retry_after = None
+            if tokens < cost:
+                retry_after = _retry_after(tokens, count, seconds, cost)
+            else:
+                tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+            return retry_after
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire_slot(self, upstream, limit):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM slots WHERE expires < ?", (now,))
+            (in_flight,) = conn.execute("SELECT COUNT(*) FROM slots WHERE upstream = ?", (upstream,)).fetchone()
+            lease = None
+            if in_flight < limit:
+                lease = uuid.uuid4().hex
+                conn.execute("INSERT INTO slots (lease, upstream, expires) VALUES (?, ?, ?)",
+                             (lease, upstream, now + SLOT_LEASE_SECONDS))
+            conn.execute("COMMIT")
+            return lease
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release_slot(self, upstream, lease):
+        self._conn().execute("DELETE FROM slots WHERE lease = ?", (lease,))
+
+
+class RateLimiter:
+    """Per-user/per-endpoint token buckets plus global concurrency caps per upstream"""
+    def __init__(self, store=None, endpoint_limits=None, user_limit=None, upstream_limits=None):
+        self.store = store or MemoryBucketStore()
+        self.endpoint_limits = dict(DEFAULT_ENDPOINT_LIMITS, **(endpoint_limits or {}))
+        self.user_limit = user_limit or DEFAULT_USER_LIMIT
+        self.upstream_limits = dict(DEFAULT_UPSTREAM_LIMITS, **(upstream_limits or {}))
+
+    def check(self, user_id, endpoint):
+        """Consume one request for this user; return None if allowed, else Retry-After seconds"""
+        retry_after = self.store.consume(f"user:{user_id}", *self.user_limit)
+        if retry_after is None and endpoint in self.endpoint_limits:
+            retry_after = self.store.consume(f"user:{user_id}:{endpoint}", *self.endpoint_limits[endpoint])
+        return retry_after
+
+    @contextmanager
+    def upstream_slot(self, upstream, timeout=0):
+        """Hold one of the upstream's concurrency slots, waiting up to `timeout` seconds for one
+        to free up (the store may be shared across workers, so this polls), else raise UpstreamBusy"""
+        limit = self.upstream_limits.get(upstream)
+        if limit is None:
+            yield
+            return
+        deadline = time.monotonic() + timeout
+        delay = SLOT_POLL_INTERVAL
+        lease = self.store.acquire_slot(upstream, limit)
+        while lease is None and time.monotonic() < deadline:
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, SLOT_POLL_MAX_INTERVAL)
+            lease = self.store.acquire_slot(upstream, limit)
+        if lease is None:
+            raise UpstreamBusy(upstream)
+        try:
+            yield
+        finally:
+            self.store.release_slot(upstream, lease)
+
+
+def create_rate_limiter():
+    """Build the limiter from RATE_LIMIT_* environment variables"""
+    store_path = os.getenv("RATE_LIMIT_STORE")
+    store = SQLiteBucketStore(store_path) if store_path else MemoryBucketStore()
+    user_limit = os.getenv("RATE_LIMIT_USER")
+    upstream_limits = {
+        name: int(limit[0]) for name, limit in parse_limits(os.getenv("RATE_LIMIT_UPSTREAMS")).items()
+    }
+    return RateLimiter(
+        store=store,
+        endpoint_limits=parse_limits(os.getenv("RATE_LIMITS")),
+        user_limit=parse_limit(user_limit) if user_limit else None,
+        upstream_limits=upstream_limits,
+    )
+
+# Create global instance
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,156 @@
+import os
+import gzip
+import zlib
+import time
+
+from static_assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional: no br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: no zstd
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/event-stream")
+# Cheap levels by default: most API responses are small and latency-bound
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 5}
+# Message lists repeat a lot of text and are large, so a higher level pays for itself
+ENDPOINT_LEVELS = {
+    "get_chat": {"zstd": 6, "br": 5, "gzip": 6},
+    "list_chats": {"zstd": 6, "br": 5, "gzip": 6},
+}
+# Tried in this order against what the client accepts
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+def available_encodings():
+    return tuple(e for e in PREFERENCE if e == "gzip" or (e == "br" and brotli) or (e == "zstd" and zstandard))
+
+
+def compress(body, encoding, level):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class StreamCompressor:
+    """Compresses a stream chunk by chunk, flushing after each so every event is sent
+    as soon as it is produced (a server-sent event must not sit in the compressor)"""
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self.obj = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == "br":
+            self.obj = brotli.Compressor(quality=level)
+        else:
+            self.obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def chunk(self, data):
+        if self.encoding == "zstd":
+            return self.obj.compress(data) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self.obj.process(data) + self.obj.flush()
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self.obj.finish()
+        return self.obj.flush()
+
+
+class ResponseCompressor:
+    """Negotiated gzip/br/zstd for API responses.
+
+    Bodies under min_bytes are sent as-is; larger ones are compressed with the client's
+    best supported encoding at a per-endpoint level. Server-sent event streams are
+    compressed incrementally. Strong ETags become weak, since the bytes now depend on the
+    encoding while the content they version does not.
+    """
+    def __init__(self, min_bytes=COMPRESS_MIN_BYTES, levels=DEFAULT_LEVELS, endpoint_levels=ENDPOINT_LEVELS,
+                 on_compressed=None):
+        self.min_bytes = min_bytes
+        self.levels = levels
+        self.endpoint_levels = endpoint_levels
+        self.encodings = available_encodings()
+        self.on_compressed = on_compressed  # called with (endpoint, encoding, bytes in, bytes out, cpu seconds)
+
+    def level(self, endpoint, encoding):
+        return self.endpoint_levels.get(endpoint, {}).get(encoding, self.levels[encoding])
+
+    def choose(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        return next((e for e in self.encodings if e in accepted), None)
+
+    def apply(self, response, endpoint, accept_encoding):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or "Content-Encoding" in response.headers or response.direct_passthrough
+                or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)):
+            return response
+        if response.is_streamed:
+            if response.mimetype == "text/event-stream":
+                self._apply_stream(response, endpoint, accept_encoding)
+            return response
+        body = response.get_data()
+        if len(body) < self.min_bytes:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose(accept_encoding)
+        if encoding is None:
+            return response
+        started = time.thread_time()
+        compressed = compress(body, encoding, self.level(endpoint, encoding))
+        cpu = time.thread_time() - started
+        if len(compressed) >= len(body):
+            return response
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        self._weaken_etag(response)
+        if self.on_compressed:
+            self.on_compressed(endpoint, encoding, len(body), len(compressed), cpu)
+        return response
+
+    def _apply_stream(self, response, endpoint, accept_encoding):
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose(accept_encoding)
+        if encoding is None:
+            return
+        stream = StreamCompressor(encoding, self.level(endpoint, encoding))
+        source = response.response
+
+        def compressed_chunks():
+            raw = out = 0
+            cpu = 0.0
+            try:
+                for data in source:
+                    data = data.encode("utf-8") if isinstance(data, str) else data
+                    started = time.thread_time()
+                    chunk = stream.chunk(data)
+                    cpu += time.thread_time() - started
+                    raw += len(data)
+                    out += len(chunk)
+                    yield chunk
+                tail = stream.finish()
+                out += len(tail)
+                yield tail
+            finally:
+                if hasattr(source, "close"):
+                    source.close()
+                if self.on_compressed:
+                    self.on_compressed(endpoint, encoding, raw, out, cpu)
+
+        response.response = compressed_chunks()
+        response.headers["Content-Encoding"] = encoding
+        response.headers.pop("Content-Length", None)
+        self._weaken_etag(response)
+
+    def _weaken_etag(self, response):
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
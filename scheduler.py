@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+
+from rate_limiter import rate_limiter, parse_limits, UpstreamBusy
+from tracing import tracer
+
+PRIORITY_INTERACTIVE = 0  # chat replies a user is waiting on
+PRIORITY_BATCH = 1        # image jobs and other slow work
+
+# Max concurrent calls per upstream issued by this worker
+DEFAULT_MAX_IN_FLIGHT = {
+    "openrouter": 4,
+    "huggingface": 1,
+}
+# Max concurrent upstream calls of any kind in this worker: the budget the priority classes
+# compete for, so chat replies get the next free slot ahead of image jobs
+DEFAULT_MAX_TOTAL_IN_FLIGHT = 4
+DEFAULT_QUEUE_TIMEOUT = 30
+# Seconds of waiting that lift a call by one priority class, so batch work can't starve
+DEFAULT_AGING = 10
+WAIT_SAMPLES = 1000
+
+
+class _Ticket:
+    """One queued upstream call waiting for a slot"""
+    def __init__(self, user_id, priority):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.event = threading.Event()
+
+
+class _UpstreamQueue:
+    """Pending calls for one upstream: priority classes of per-user FIFO queues"""
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.classes = {}  # priority -> OrderedDict(user_id -> deque of tickets)
+        self.credits = {}  # user_id -> grants left in the user's current round
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.granted = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def depth(self):
+        return sum(len(q) for users in self.classes.values() for q in users.values())
+
+    def push(self, ticket, priority):
+        users = self.classes.setdefault(priority, OrderedDict())
+        users.setdefault(ticket.user_id, deque()).append(ticket)
+
+    def remove(self, ticket):
+        for users in self.classes.values():
+            queue = users.get(ticket.user_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del users[ticket.user_id]
+                return
+
+    def heads(self):
+        """The ticket each priority class would grant next (its round robin head)"""
+        return [next(iter(users.values()))[0] for users in self.classes.values() if users]
+
+    def pop(self, priority, weights):
+        """Next ticket of a priority class, weighted round robin across users within it"""
+        users = self.classes[priority]
+        user_id, queue = next(iter(users.items()))
+        ticket = queue.popleft()
+        credits = self.credits.get(user_id, weights.get(user_id, 1)) - 1
+        if not queue:
+            del users[user_id]
+            self.credits.pop(user_id, None)
+        elif credits <= 0:
+            users.move_to_end(user_id)
+            self.credits.pop(user_id, None)
+        else:
+            self.credits[user_id] = credits
+        return ticket
+
+    def record_wait(self, ticket):
+        waited = time.monotonic() - ticket.enqueued
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.waits.append(waited)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class UpstreamScheduler:
+    """Queues upstream calls fairly across users and caps in-flight calls per upstream.
+
+    All upstreams share one in-flight budget (max_total_in_flight). When a slot frees up it
+    goes to the waiting call with the best priority across every upstream that has room,
+    after aging: each `aging` seconds of waiting lifts a call by one class. Within a class,
+    users take turns by weight. A call waits up to queue_timeout, including for the gate's
+    cross-worker slot, before UpstreamBusy is raised.
+    """
+    def __init__(self, max_in_flight=None, queue_timeout=DEFAULT_QUEUE_TIMEOUT, weights=None, gate=None,
+                 max_total_in_flight=DEFAULT_MAX_TOTAL_IN_FLIGHT, aging=DEFAULT_AGING):
+        self.lock = threading.Lock()
+        self.limits = dict(DEFAULT_MAX_IN_FLIGHT, **(max_in_flight or {}))
+        self.max_total_in_flight = max_total_in_flight
+        self.total_in_flight = 0
+        self.queue_timeout = queue_timeout
+        self.aging = aging
+        self.weights = dict(weights or {})
+        self.gate = gate  # optional factory gate(upstream, timeout) of a context manager around each call
+        self.queues = {}
+
+    def set_weight(self, user_id, weight):
+        """Let a user get `weight` consecutive turns per round"""
+        with self.lock:
+            self.weights[user_id] = max(1, int(weight))
+
+    def _queue(self, upstream):
+        queue = self.queues.get(upstream)
+        if queue is None:
+            queue = self.queues[upstream] = _UpstreamQueue(self.limits.get(upstream, 1))
+        return queue
+
+    def _busy(self, upstream):
+        return UpstreamBusy(upstream, retry_after=max(1, int(self.queue_timeout / 10)))
+
+    def _acquire(self, upstream, user_id, priority):
+        ticket = _Ticket(user_id, priority)
+        with self.lock:
+            queue = self._queue(upstream)
+            queue.push(ticket, priority)
+            self._dispatch()
+
+        if ticket.event.wait(self.queue_timeout):
+            return
+        with self.lock:
+            if ticket.granted:
+                return
+            queue.remove(ticket)
+            queue.timed_out += 1
+        raise self._busy(upstream)
+
+    def _dispatch(self):
+        """Grant free slots to the best waiting calls; called with the lock held"""
+        while self.total_in_flight < self.max_total_in_flight:
+            now = time.monotonic()
+            best = None
+            for queue in self.queues.values():
+                if queue.in_flight >= queue.max_in_flight:
+                    continue
+                for ticket in queue.heads():
+                    rank = (ticket.priority - (now - ticket.enqueued) / self.aging, ticket.enqueued)
+                    if best is None or rank < best[0]:
+                        best = (rank, queue, ticket.priority)
+            if best is None:
+                return
+            _, queue, priority = best
+            ticket = queue.pop(priority, self.weights)
+            queue.in_flight += 1
+            self.total_in_flight += 1
+            ticket.granted = True
+            queue.record_wait(ticket)
+            ticket.event.set()
+
+    def _release(self, upstream):
+        with self.lock:
+            self.queues[upstream].in_flight -= 1
+            self.total_in_flight -= 1
+            self._dispatch()
+
+    def run(self, upstream, user_id, fn, *args, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Wait for this user's turn on `upstream`, then call fn(*args, **kwargs)"""
+        started = time.monotonic()
+        with tracer.span("queue_wait", upstream=upstream):
+            self._acquire(upstream, user_id, priority)
+        try:
+            # The cross-worker cap may still be full: wait for it out of the same queue_timeout
+            remaining = max(0.0, self.queue_timeout - (time.monotonic() - started))
+            with (self.gate(upstream, remaining) if self.gate else nullcontext()):
+                return fn(*args, **kwargs)
+        finally:
+            self._release(upstream)
+
+    def stats(self):
+        """Queue depth, in-flight count and wait times per upstream"""
+        with self.lock:
+            out = {}
+            for upstream, queue in self.queues.items():
+                out[upstream] = {
+                    "max_in_flight": queue.max_in_flight,
+                    "in_flight": queue.in_flight,
+                    "total_in_flight": self.total_in_flight,
+                    "max_total_in_flight": self.max_total_in_flight,
+                    "queue_depth": queue.depth(),
+                    "queue_depth_by_priority": {
+                        str(priority): sum(len(q) for q in users.values())
+                        for priority, users in queue.classes.items()
+                    },
+                    "granted": queue.granted,
+                    "timed_out": queue.timed_out,
+                    "wait_avg_ms": round(queue.total_wait / queue.granted * 1000, 2) if queue.granted else 0.0,
+                    "wait_p50_ms": round(_percentile(queue.waits, 50) * 1000, 2),
+                    "wait_p95_ms": round(_percentile(queue.waits, 95) * 1000, 2),
+                    "wait_max_ms": round(queue.max_wait * 1000, 2),
+                }
+            return out
+
+
+def create_scheduler():
+    """Build the scheduler from SCHEDULER_* environment variables"""
+    max_in_flight = {
+        name: int(limit[0]) for name, limit in parse_limits(os.getenv("SCHEDULER_MAX_IN_FLIGHT")).items()
+    }
+    return UpstreamScheduler(
+        max_in_flight=max_in_flight,
+        queue_timeout=float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT)),
+        max_total_in_flight=int(os.getenv("SCHEDULER_MAX_TOTAL_IN_FLIGHT", DEFAULT_MAX_TOTAL_IN_FLIGHT)),
+        aging=float(os.getenv("SCHEDULER_AGING", DEFAULT_AGING)),
+        gate=rate_limiter.upstream_slot,
+    )
+
+# Create global instance
+
+upstream_scheduler = create_scheduler()
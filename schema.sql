@@ -0,0 +1,27 @@
+-- Supabase tables added alongside users, conversations, messages and password_reset_tokens.
+
+-- One row per deleted chat, so /chats?since= can report deletions instead of every chat id.
+-- `deleted` is epoch seconds, like conversations.updated; the janitor drops rows older than
+-- chat_sync.TOMBSTONE_TTL.
+create table if not exists chat_tombstones (
+    chat_id text primary key,
+    user_id text not null,
+    deleted double precision not null
+);
+create index if not exists chat_tombstones_user_deleted on chat_tombstones (user_id, deleted);
+-- The janitor reads tombstones by time alone to purge messages of deleted chats and expire them
+create index if not exists chat_tombstones_deleted on chat_tombstones (deleted);
+
+-- One row per issued refresh token (auth_tokens.REFRESH_TABLE). A family is the chain of
+-- tokens rotated from one login; revoking it deletes its rows. `used` is set by rotation
+-- with a compare-and-set, and `used_at` bounds the grace period for racing requests.
+create table if not exists refresh_tokens (
+    jti text primary key,
+    family text not null,
+    user_id text not null,
+    expires_at timestamptz not null,
+    used boolean not null default false,
+    used_at timestamptz
+);
+create index if not exists refresh_tokens_family on refresh_tokens (family);
+create index if not exists refresh_tokens_expires_at on refresh_tokens (expires_at);
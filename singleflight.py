@@ -0,0 +1,76 @@
+import hashlib
+import threading
+
+from json_codec import dumpb
+
+
+def request_key(kind, payload):
+    """Stable key for an upstream request: a hash of its canonical JSON payload.
+
+    Use the same key for response caching so cached and in-flight lookups agree.
+    """
+    return f"{kind}:{hashlib.sha256(dumpb(payload, sort_keys=True)).hexdigest()}"
+
+
+class _Call:
+    """One in-flight call shared by every caller with the same key"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent identical calls: one runs, the rest wait for its result"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats_by_kind = {}
+
+    def _count(self, key, field):
+        kind = key.split(":", 1)[0]
+        stats = self.stats_by_kind.setdefault(kind, {"calls": 0, "executed": 0, "coalesced": 0})
+        stats[field] += 1
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless an identical call is in flight; share its outcome"""
+        with self.lock:
+            self._count(key, "calls")
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self._count(key, "executed")
+            else:
+                call.waiters += 1
+                self._count(key, "coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Calls seen, upstream calls made and calls coalesced, per request kind"""
+        with self.lock:
+            return {
+                kind: dict(stats, in_flight=sum(1 for k in self.calls if k.startswith(kind + ":")))
+                for kind, stats in self.stats_by_kind.items()
+            }
+
+# Create global instance
+
+single_flight = SingleFlight()
@@ -0,0 +1,899 @@
+/* Client logic:
+ - History list with 3-dots hover menu (Rename, Delete)
+ - New chat, rename, delete
+ - Send message -> server -> reveal with fast typing animation
+ - Copy button below each bubble (ChatGPT style)
+ - Enter to send
+*/
+
+const historyEl = document.getElementById('history');
+const newChatBtn = document.getElementById('newChatBtn');
+const titleInput = document.getElementById('titleInput');
+const topicHint = document.getElementById('topicHint');
+const messagesEl = document.getElementById('messages');
+const textInput = document.getElementById('textInput');
+const sendBtn = document.getElementById('sendBtn');
+const statusHint = document.getElementById('statusHint');
+
+let chatId = null;
+let chats = {}; // id -> {title, messages, updated}
+
+// utilities
+const el = (tag, cls, html) => { const d = document.createElement(tag); if(cls) d.className = cls; if(html!==undefined) d.innerHTML = html; return d; };
+const escapeHtml = (s) => (s||'').replace(/&/g,'&amp;').replace(/</g,'&lt;').replace(/>/g,'&gt;');
+function stripHtml(s){ const tmp=document.createElement('div'); tmp.innerHTML = s; return tmp.innerText; }
+
+/* Virtual list: only rows near the viewport are in the DOM. The space of the rows above
+   and below is kept as padding on the row container, computed from each row's measured
+   height (an estimate until it has been rendered once), so a chat or history with
+   thousands of entries costs the same to scroll as a short one.
+   opts: render(i) -> node, estimate (px), gap (px), overscan (px), onNearTop() */
+function createVirtualList(scrollEl, opts){
+  const estimate = opts.estimate || 80;
+  const gap = opts.gap || 0;
+  const overscan = opts.overscan || 800;
+  const rows = el('div','vlist-rows');
+  const live = el('div','vlist-live'); // nodes that aren't rows yet: typing indicator, streaming reply
+  rows.style.gap = live.style.gap = gap + 'px';
+  scrollEl.append(rows, live);
+  scrollEl.style.overflowAnchor = 'none'; // we anchor the scroll position ourselves
+
+  let heights = [];      // row height + gap, measured or estimated
+  let offsets = [0];     // offsets[i] = top of row i; valid up to `validTo`
+  let validTo = 0;
+  let nodes = new Map(); // index -> rendered node
+  let first = 0, last = 0; // rendered range [first, last)
+  let frame = 0;
+
+  function offset(i){
+    for(; validTo < i; validTo++) offsets[validTo + 1] = offsets[validTo] + heights[validTo];
+    return offsets[i];
+  }
+  function invalidate(i){ if(i < validTo) validTo = i; }
+  function indexAt(y){
+    offset(heights.length);
+    let lo = 0, hi = heights.length - 1;
+    while(lo < hi){
+      const mid = (lo + hi + 1) >> 1;
+      if(offsets[mid] <= y) lo = mid; else hi = mid - 1;
+    }
+    return lo;
+  }
+
+  function render(pin){
+    frame = 0;
+    const n = heights.length;
+    if(pin) scrollEl.scrollTop = scrollEl.scrollHeight;
+    const base = rows.getBoundingClientRect().top - scrollEl.getBoundingClientRect().top + scrollEl.scrollTop;
+    const viewTop = scrollEl.scrollTop - base;
+    const start = n ? indexAt(Math.max(0, viewTop - overscan)) : 0;
+    const end = n ? Math.min(n, indexAt(viewTop + scrollEl.clientHeight + overscan) + 1) : 0;
+
+    for(const [i, node] of nodes){
+      if(i < start || i >= end){ node.remove(); nodes.delete(i); }
+    }
+    const anchor = rows.firstChild;
+    const keptFirst = nodes.size ? Math.max(first, start) : end;
+    for(let i = start; i < end; i++){
+      if(nodes.has(i)) continue;
+      const node = opts.render(i);
+      nodes.set(i, node);
+      if(i < keptFirst) rows.insertBefore(node, anchor); else rows.appendChild(node);
+    }
+    first = start; last = end;
+
+    // Measure what is rendered; keep the first visible row where it was on screen
+    const anchorIndex = n ? indexAt(Math.max(0, viewTop)) : 0;
+    const anchorTop = offset(anchorIndex);
+    let changed = false;
+    for(const [i, node] of nodes){
+      const h = node.offsetHeight + gap;
+      if(h !== heights[i]){ heights[i] = h; invalidate(i); changed = true; }
+    }
+    rows.style.paddingTop = offset(start) + 'px';
+    rows.style.paddingBottom = (offset(n) - offset(end)) + 'px';
+    if(pin) scrollEl.scrollTop = scrollEl.scrollHeight;
+    else if(changed && offset(anchorIndex) !== anchorTop) scrollEl.scrollTop += offset(anchorIndex) - anchorTop;
+    if(changed) schedule(); // real heights may leave part of the viewport uncovered
+  }
+
+  function schedule(){ if(!frame) frame = requestAnimationFrame(() => render(false)); }
+
+  scrollEl.addEventListener('scroll', ()=> {
+    schedule();
+    if(opts.onNearTop && scrollEl.scrollTop < overscan) opts.onNearTop();
+  }, { passive: true });
+  window.addEventListener('resize', schedule);
+
+  return {
+    live,
+    // Replace the list with n rows
+    reset(n){
+      nodes.forEach(node => node.remove());
+      nodes = new Map();
+      live.innerHTML = '';
+      heights = new Array(n).fill(estimate);
+      validTo = 0; first = last = 0;
+      render(false);
+    },
+    // k rows were added at the end
+    append(k){
+      for(let i = 0; i < k; i++) heights.push(estimate);
+      render(true);
+    },
+    // k rows were added at the start; the rows on screen stay where they are
+    prepend(k){
+      heights = new Array(k).fill(estimate).concat(heights);
+      const shifted = new Map();
+      nodes.forEach((node, i) => shifted.set(i + k, node));
+      nodes = shifted;
+      first += k; last += k;
+      validTo = 0;
+      scrollEl.scrollTop += k * estimate;
+      render(false);
+    },
+    scrollToBottom(){ render(true); },
+    // Re-render the visible rows, e.g. after their data changed
+    refresh(){
+      nodes.forEach(node => node.remove());
+      nodes = new Map();
+      render(false);
+    }
+  };
+}
+
+// ---- History ----
+document.getElementById('fileInput').addEventListener('change', () => {
+    const files = document.getElementById('fileInput').files;
+    if (files.length) {
+        document.getElementById('fileStatus').innerText = files.length + " file(s) selected: " + files[0].name;
+    } else {
+        document.getElementById('fileStatus').innerText = "No file uploaded";
+    }
+});
+let historyIds = [];
+const historyList = createVirtualList(historyEl, { estimate: 48, gap: 6, render: (i)=> historyItem(historyIds[i]) });
+
+function renderHistory(){
+  historyIds = Object.keys(chats).sort((a,b)=> (chats[b].updated||0) - (chats[a].updated||0));
+  historyList.reset(historyIds.length);
+}
+
+function historyItem(id){
+    const item = el('div','hist-item');
+    if(id === chatId) item.classList.add('active');
+
+    const title = el('div','hist-title', escapeHtml(chats[id].title || 'New Chat'));
+    item.appendChild(title);
+
+    const dots = el('div','dots', `
+      <svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="#a9c6ff" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+        <circle cx="12" cy="5" r="1"></circle><circle cx="12" cy="12" r="1"></circle><circle cx="12" cy="19" r="1"></circle>
+      </svg>`);
+    item.appendChild(dots);
+
+    const menu = el('div','menu');
+    menu.innerHTML = `
+      <div class="menu-item" data-action="rename">Rename</div>
+      <div class="menu-item danger" data-action="delete">Delete</div>
+    `;
+    item.appendChild(menu);
+
+    dots.addEventListener('click', (e)=> {
+      e.stopPropagation();
+      // toggle menu
+      const open = menu.classList.contains('open');
+      closeAllMenus();
+      if(!open) menu.classList.add('open');
+    });
+
+    menu.addEventListener('click', async (e)=>{
+      e.stopPropagation();
+      const act = e.target && e.target.getAttribute('data-action');
+      if(act === 'rename'){
+        const newTitle = prompt('Rename chat:', chats[id].title || 'Chat');
+        if(newTitle !== null){
+          await renameChatOnServer(id, newTitle.trim() || 'Chat');
+          chats[id].title = newTitle.trim() || 'Chat';
+          renderHistory();
+          if(id === chatId){ titleInput.value = chats[id].title; }
+        }
+      } else if(act === 'delete'){
+        // no popup confirmation per your request; just delete
+        await deleteChatOnServer(id);
+        chatCache.remove(id);
+        delete chats[id];
+        if(chatId === id){
+          // load another or create new
+          const remaining = Object.keys(chats);
+          if(remaining.length){
+            await loadChat(remaining.sort((a,b)=> (chats[b].updated||0)-(chats[a].updated||0))[0]);
+          } else {
+            await createNewChat();
+          }
+        } else {
+          renderHistory();
+        }
+      }
+      closeAllMenus();
+    });
+
+    item.addEventListener('click', ()=> loadChat(id));
+    return item;
+}
+
+function closeAllMenus(){
+  document.querySelectorAll('.menu').forEach(m=>m.classList.remove('open'));
+}
+
+document.addEventListener('click', closeAllMenus);
+
+// ---- Messages ----
+const renderMarkdown = (md) => window.marked ? marked.parse(md) : escapeHtml(md).replace(/\n/g,'<br/>');
+
+function messageBubble(m){
+  if(m.role === 'image') return imageBubble(m);
+  const cls = m.role === 'user' ? 'user' : 'ai';
+  const bubble = el('div', 'msg '+cls, m.role==='assistant' ? renderMarkdown(m.content) : escapeHtml(m.content).replace(/\n/g,'<br/>'));
+  const tools = el('div','bubble-tools');
+  const copyBtn = el('button','chip-btn','Copy');
+  copyBtn.addEventListener('click', ()=> {
+    navigator.clipboard.writeText(stripHtml(bubble.innerHTML));
+    copyBtn.textContent = 'Copied!';
+    setTimeout(()=> copyBtn.textContent = 'Copy', 1000);
+  });
+  tools.appendChild(copyBtn);
+  bubble.appendChild(tools);
+  return bubble;
+}
+
+function imageBubble(m){
+  const bubble = el('div','msg ai image-msg');
+  bubble.innerHTML = `
+                <img src="${m.content}" 
+                    alt="Generated Image" 
+                    onerror="this.style.display='none'">
+                <div class="bubble-tools">
+                    <button class="chip-btn" onclick="downloadImage('${m.content}', '${m.prompt.replace(/[^a-z0-9]/gi, '_')}')">
+                        💾 Download
+                    </button>
+                    <button class="chip-btn" onclick="regenerateImage('${m.prompt}', 'flux')">
+                        🔄 Regenerate
+                    </button>
+                </div>
+            `;
+  return bubble;
+}
+
+const MESSAGE_PAGE_SIZE = 100;
+const messageList = createVirtualList(messagesEl, {
+  estimate: 90, gap: 14,
+  render: (i)=> messageBubble(chats[chatId].messages[i]),
+  onNearTop: ()=> loadOlderMessages()
+});
+
+// Full render, only on chat switch; new messages go through appendMessage()
+function renderMessages(){
+  const msgs = chatId && chats[chatId] ? chats[chatId].messages || [] : [];
+  messageList.reset(msgs.length);
+  messageList.scrollToBottom();
+}
+
+// Add a message to a chat, and to the list if that chat is on screen
+function appendMessage(m, id = chatId){
+  chats[id].messages.push(m);
+  if(id === chatId) messageList.append(1);
+}
+
+/* Incremental markdown for a reply that grows over time.
+   Text up to the last blank line outside a code fence is a finished block: it is parsed
+   once and appended. Only the open trailing block is re-parsed on each update, so the
+   cost per update stays constant instead of growing with the reply. */
+function createMarkdownStream(container, before){
+  const done = el('div','md-done');
+  const tail = el('div','md-tail');
+  container.insertBefore(done, before);
+  container.insertBefore(tail, before);
+  let committed = 0;   // text before this offset is rendered into `done`
+  let scanned = 0;     // complete lines before this offset have been scanned
+  let boundary = 0;    // end of the last finished block found so far
+  let inFence = false; // whether `scanned` sits inside a ``` / ~~~ block
+  return {
+    update(text){
+      let nl;
+      while((nl = text.indexOf('\n', scanned)) !== -1){
+        const line = text.slice(scanned, nl);
+        if(/^\s*(```|~~~)/.test(line)) inFence = !inFence;
+        else if(!inFence && line.trim() === '') boundary = nl + 1;
+        scanned = nl + 1;
+      }
+      if(boundary > committed){
+        done.insertAdjacentHTML('beforeend', renderMarkdown(text.slice(committed, boundary)));
+        committed = boundary;
+      }
+      tail.innerHTML = renderMarkdown(text.slice(committed));
+    }
+  };
+}
+
+function showTyping(){
+  const t = el('div','msg ai typing','<div class="dot"></div><div class="dot"></div><div class="dot"></div>');
+  messageList.live.appendChild(t);
+  messagesEl.scrollTop = messagesEl.scrollHeight;
+  return t;
+}
+
+// ---- Server I/O ----
+async function createNewChat(){
+  const res = await fetch('/new_chat', { method:'POST' });
+  const j = await res.json();
+  const id = j.chat_id;
+  chats[id] = { title: 'New Chat', messages: [], updated: Date.now() };
+  chatId = id;
+  titleInput.value = 'New Chat';
+  topicHint.textContent = '';
+  renderHistory();
+  renderMessages();
+  titleInput.focus();
+  return id;
+}
+
+// ---- Offline cache ----
+/* Conversations the user opened, as last served by /get_chat, kept in IndexedDB with the
+   chat's version stamp (the response ETag). Opening a cached chat renders it at once and
+   revalidates in the background, which costs a 304 when the chat hasn't changed. */
+const CHAT_CACHE_LIMIT = 200; // chats kept per browser; least recently opened are evicted
+
+const chatCache = (()=> {
+  let db = null;
+  function open(){
+    if(!db) db = new Promise((resolve, reject) => {
+      if(!window.indexedDB) return reject(new Error('IndexedDB unavailable'));
+      const req = indexedDB.open('pcp-chats', 1);
+      req.onupgradeneeded = () => req.result.createObjectStore('chats', { keyPath: 'key' }).createIndex('opened', 'opened');
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+    return db;
+  }
+  function run(mode, fn){
+    return open().then(d => new Promise((resolve, reject) => {
+      const t = d.transaction('chats', mode);
+      const req = fn(t.objectStore('chats'));
+      t.oncomplete = () => resolve(req ? req.result : undefined);
+      t.onerror = () => reject(t.error);
+    }));
+  }
+  const key = (id) => currentUser + ':' + id;
+  function evict(store){
+    const count = store.count();
+    count.onsuccess = () => {
+      let extra = count.result - CHAT_CACHE_LIMIT;
+      if(extra <= 0) return;
+      store.index('opened').openCursor().onsuccess = (e) => {
+        const cursor = e.target.result;
+        if(cursor && extra-- > 0){ cursor.delete(); cursor.continue(); }
+      };
+    };
+  }
+  // Cache failures only cost a round trip, so they are logged and otherwise ignored
+  const quiet = (e) => { console.log('Chat cache:', e); return null; };
+  return {
+    get: (id) => run('readonly', s => s.get(key(id))).catch(quiet),
+    put: (id, entry) => run('readwrite', s => {
+      s.put(Object.assign({ key: key(id), opened: Date.now() }, entry));
+      evict(s);
+    }).catch(quiet),
+    remove: (id) => run('readwrite', s => s.delete(key(id))).catch(quiet)
+  };
+})();
+
+async function loadChat(id){
+  if(!id) return;
+  chatId = id;
+  chats[id] = chats[id] || { title: 'Chat', messages: [] };
+  const cached = await chatCache.get(id);
+  if(chatId !== id) return; // switched to another chat meanwhile
+  if(cached){
+    showChat(id, cached.messages, cached.first);
+    chatCache.put(id, { version: cached.version, first: cached.first, messages: cached.messages });
+    fetchChat(id, cached.version);
+    return;
+  }
+  await fetchChat(id);
+}
+
+// Latest page of a chat from the server; with `version`, only if the chat changed since
+async function fetchChat(id, version){
+  let res;
+  try{
+    res = await fetch(`/get_chat/${id}?limit=${MESSAGE_PAGE_SIZE}`, { headers: version ? { 'If-None-Match': `"${version}"` } : {} });
+  }catch(e){
+    if(version) return; // offline: the cached copy stays on screen
+    throw e;
+  }
+  if(res.status === 304 || (version && !res.ok)) return;
+  const msgs = await res.json();
+  // Server-side index of messages[0]; older pages are fetched as the user scrolls up
+  const first = Number(res.headers.get('X-Total-Count') || msgs.length) - msgs.length;
+  const stamp = (res.headers.get('ETag') || '').replace(/^W\//, '').replace(/"/g, '');
+  if(stamp) chatCache.put(id, { version: stamp, first: first, messages: msgs });
+  if(chatId === id) showChat(id, msgs, first);
+}
+
+function showChat(id, msgs, first){
+  chats[id] = chats[id] || { title: 'Chat', messages: [] };
+  chats[id].messages = msgs;
+  chats[id].first = first;
+  chats[id].updated = Date.now();
+  if(!chats[id].title || chats[id].title === 'New Chat'){
+    const firstUser = msgs.find(m=>m.role==='user');
+    chats[id].title = firstUser ? (firstUser.content.split('\n')[0].slice(0,60)) : (chats[id].title || 'Chat');
+  }
+  titleInput.value = chats[id].title || 'Chat';
+  renderHistory();
+  renderMessages();
+}
+
+async function loadOlderMessages(){
+  const id = chatId;
+  const chat = chats[id];
+  if(!chat || !chat.first || chat.loadingOlder) return;
+  chat.loadingOlder = true;
+  try{
+    const res = await fetch(`/get_chat/${id}?limit=${MESSAGE_PAGE_SIZE}&before=${chat.first}`);
+    const older = await res.json();
+    chat.messages = older.concat(chat.messages);
+    chat.first = older.length ? chat.first - older.length : 0;
+    if(id === chatId) messageList.prepend(older.length);
+  } finally {
+    chat.loadingOlder = false;
+  }
+}
+
+async function renameChatOnServer(id, newTitle){
+  await fetch('/rename_chat', {
+    method:'POST',
+    headers:{'Content-Type':'application/json'},
+    body: JSON.stringify({ chat_id: id, title: newTitle })
+  });
+}
+
+async function deleteChatOnServer(id){
+  await fetch(`/delete_chat/${id}`, { method:'DELETE' });
+}
+
+// ---- Send / Type animation ----
+
+async function sendMessage(){
+  const text = textInput.value.trim();
+  if(!text || !chatId) return;
+    // Combine uploaded file text with user input
+
+
+  // add user bubble immediately
+  const id = chatId;
+  const userMsg = { role:'user', content: text };
+  chats[id].updated = Date.now();
+  appendMessage(userMsg, id);
+  textInput.value = '';
+
+  const typingNode = showTyping();
+
+  try{
+    const res = await fetch('/chat', {
+      method:'POST',
+      headers:{'Content-Type':'application/json'},
+      body: JSON.stringify({ chat_id: id, message: text })
+
+    });
+    const j = await res.json();
+
+    typingNode.remove();
+
+    if(j.error){
+      const msg = (j.error || 'Error').toString();
+      appendMessage({ role:'error', content: 'Error: ' + msg }, id);
+      return;
+    }
+
+    const reply = j.reply || '';
+    // create blank bubble and reveal quickly
+    const aiNode = el('div','msg ai','');
+    const tools = el('div','bubble-tools');
+    const copyBtn = el('button','chip-btn','Copy');
+    copyBtn.addEventListener('click', ()=> {
+      navigator.clipboard.writeText(stripHtml(aiNode.innerHTML));
+      copyBtn.textContent='Copied!'; setTimeout(()=> copyBtn.textContent='Copy', 1000);
+    });
+    aiNode.appendChild(tools);
+    const stream = createMarkdownStream(aiNode, tools);
+    if(id === chatId) messageList.live.appendChild(aiNode);
+    messagesEl.scrollTop = messagesEl.scrollHeight;
+
+    let idx = 0;
+    const baseMs = 10; // faster typing (your request)
+    function reveal(){
+      idx += Math.max(1, Math.floor(reply.length/800)); // adaptive chunk
+      // Render markdown progressively; only the trailing open block is re-parsed
+      stream.update(reply.slice(0, idx));
+      messagesEl.scrollTop = messagesEl.scrollHeight;
+      if(idx < reply.length){
+        setTimeout(reveal, baseMs + Math.floor(Math.random()*6));
+      } else {
+        // The finished reply becomes a regular row in the list
+        aiNode.remove();
+        appendMessage({ role:'assistant', content: reply }, id);
+        chats[id].updated = Date.now();
+        if(!chats[id].title || chats[id].title === 'New Chat'){
+          const firstUser = chats[id].messages.find(m=>m.role==='user');
+          if(firstUser){
+            const t = firstUser.content.trim().split('\n')[0].slice(0,60);
+            chats[id].title = t || 'Chat';
+            renameChatOnServer(id, chats[id].title);
+          }
+        }
+        renderHistory();
+      }
+    }
+    reveal();
+
+  }catch(err){
+    console.error(err);
+    if(typingNode && typingNode.remove) typingNode.remove();
+    appendMessage({ role:'error', content: 'Network error.' }, id);
+  }
+}
+
+// ---- Init & events ----
+const CHAT_PAGE_SIZE = 200;
+const CHAT_LIST_POLL_MS = 30000;
+let chatListVersion = null; // server version of the chat list that `chats` reflects
+let currentUser = 'anonymous';
+
+/* The chat list is cached in localStorage with its server version. On load and on each
+   poll only the changes since that version are fetched; when nothing changed the server
+   answers 304. */
+const chatListCacheKey = () => 'chatList:' + currentUser;
+
+function addChatEntry(item){
+  if(!chats[item.chat_id]) chats[item.chat_id] = { title: item.title || 'Chat', messages: [], updated: item.updated || 0 };
+}
+
+// Start over from an empty list, keeping the open chat and its loaded messages
+function clearChats(){
+  const open = chats[chatId];
+  chats = {};
+  if(open) chats[chatId] = open;
+}
+
+function saveChatListCache(){
+  try{
+    const list = Object.keys(chats).map(id => ({ chat_id: id, title: chats[id].title, updated: chats[id].updated }));
+    localStorage.setItem(chatListCacheKey(), JSON.stringify({ version: chatListVersion, chats: list }));
+  }catch(e){
+    console.log('Chat list not cached:', e); // quota or storage disabled; the next load is a full fetch
+  }
+}
+
+function readChatListCache(){
+  try{ return JSON.parse(localStorage.getItem(chatListCacheKey())); }catch(e){ return null; }
+}
+
+// Fetch one page of the chat list into `chats`; returns [items on the page, total chats, list version]
+async function fetchChatsPage(offset){
+  const res = await fetch(`/chats?limit=${CHAT_PAGE_SIZE}&offset=${offset}`);
+  const j = await res.json();
+  j.forEach(addChatEntry);
+  const etag = (res.headers.get('ETag') || '').replace(/^W\//, '').replace(/"/g, '');
+  return [j.length, Number(res.headers.get('X-Total-Count') || j.length), etag || null];
+}
+
+// Apply the changes since chatListVersion; false if the server can't tell and the list must be reloaded
+async function syncChatsList(){
+  const version = chatListVersion;
+  let res;
+  try{
+    res = await fetch(`/chats?since=${encodeURIComponent(version)}`, { headers: { 'If-None-Match': `"${version}"` } });
+  }catch(e){
+    return true; // offline: keep showing the cached list
+  }
+  if(res.status === 304 || !res.ok) return true;
+  const j = await res.json();
+  if(j.reset) return false;
+  // Deleted chats come as "deleted"; "ids" (every chat) only when a deletion left no record
+  const live = j.ids ? new Set(j.ids) : null;
+  const gone = new Set(j.deleted || []);
+  const deleted = Object.keys(chats).filter(id => gone.has(id) || (live && !live.has(id)));
+  deleted.forEach(id => {
+    chatCache.remove(id);
+    if(id !== chatId) delete chats[id];
+  });
+  j.changes.forEach(item => {
+    const chat = chats[item.chat_id];
+    if(chat){ chat.title = item.title || 'Chat'; chat.updated = item.updated || 0; }
+    else addChatEntry(item);
+  });
+  chatListVersion = j.version;
+  saveChatListCache();
+  if(j.changes.length || deleted.length) renderHistory();
+  return true;
+}
+
+// Cached list plus changes when possible; otherwise the newest page is awaited and
+// the rest of the history fills in in the background
+async function loadChatsList(){
+  const cached = readChatListCache();
+  if(cached && cached.version){
+    clearChats();
+    cached.chats.forEach(addChatEntry);
+    chatListVersion = cached.version;
+    renderHistory();
+    if(await syncChatsList()) return;
+  }
+  clearChats();
+  chatListVersion = null;
+  let [count, total, version] = await fetchChatsPage(0);
+  renderHistory();
+  (async ()=> {
+    for(let offset = count; count && offset < total; offset += count){
+      [count, total] = await fetchChatsPage(offset);
+      renderHistory();
+    }
+    chatListVersion = version;
+    if(version) saveChatListCache();
+  })();
+}
+
+setInterval(async ()=> {
+  if(document.hidden || !chatListVersion) return;
+  if(!(await syncChatsList())) await loadChatsList();
+}, CHAT_LIST_POLL_MS);
+
+newChatBtn.addEventListener('click', async ()=> { await createNewChat(); });
+sendBtn.addEventListener('click', sendMessage);
+textInput.addEventListener('keydown', (e)=> {
+  if(e.key==='Enter' && !e.shiftKey){ e.preventDefault(); sendMessage(); }
+});
+titleInput.addEventListener('keydown', async (e)=> {
+  if(e.key==='Enter'){
+    e.preventDefault();
+    if(!chatId) return;
+    const newTitle = titleInput.value.trim() || 'Chat';
+    chats[chatId].title = newTitle;
+    await renameChatOnServer(chatId, newTitle);
+    renderHistory();
+  }
+});
+
+// ---- User Info & Logout ----
+async function loadUserInfo() {
+    try {
+        const response = await fetch('/user-info');
+        if (response.ok) {
+            const userData = await response.json();
+            currentUser = userData.email || userData.username;
+            
+            document.getElementById('userName').textContent = userData.username;
+            document.getElementById('userEmail').textContent = userData.email;
+            document.getElementById('userAvatar').textContent = userData.username.charAt(0).toUpperCase();
+        } else {
+            throw new Error('Failed to fetch user info');
+        }
+    } catch (error) {
+        console.log('Failed to load user info:', error);
+        // Show generic info
+        document.getElementById('userName').textContent = 'User';
+        document.getElementById('userEmail').textContent = 'Welcome to PCP Assistant';
+    }
+}
+
+// Logout functionality
+document.getElementById('logoutBtn').addEventListener('click', function() {
+    if (confirm('Are you sure you want to logout?')) {
+        window.location.href = '/logout';
+    }
+});
+
+// Update your existing window load event to include user info
+window.addEventListener('load', async ()=> {
+    await loadUserInfo();  // Add this line
+    await loadChatsList();
+    const ids = Object.keys(chats);
+    if(ids.length === 0){
+        await createNewChat();
+    } else {
+        const sorted = ids.slice().sort((a,b)=> (chats[b].updated||0) - (chats[a].updated||0));
+        await loadChat(sorted[0]);
+    }
+    performance.mark('chat-ready');
+});
+
+// Image Generation
+document.getElementById('generateImageBtn').addEventListener('click', async function() {
+    const prompt = document.getElementById('imagePrompt').value.trim();
+    const model = document.getElementById('imageModel').value;
+    
+    if (!prompt) {
+        showNotification('Please enter an image description', 'error');
+        return;
+    }
+    
+    const btn = this;
+    const originalText = btn.innerHTML;
+    btn.innerHTML = '🎨 Generating...';
+    btn.disabled = true;
+    
+    try {
+        const response = await fetch('/generate-image', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({ 
+                prompt: prompt,
+                model: model
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            // Create image message
+            appendMessage({ role: 'image', content: data.image_url, prompt: prompt });
+
+            // Clear prompt
+            document.getElementById('imagePrompt').value = '';
+            
+            showNotification('Image generated successfully!', 'success');
+        } else {
+            showNotification(data.error || 'Failed to generate image', 'error');
+        }
+        // 🧠 Auto-rename chat from AI's first reply
+        if (chats[chatId] && (!chats[chatId].title || chats[chatId].title === "New Chat")) {
+            const aiTitle = (data.reply || "")
+                .split(" ")
+                .slice(0, 6)
+                .join(" ")
+                .replace(/[^\w\s]/g, "")
+                .trim();
+
+            chats[chatId].title = aiTitle || "Chat";
+            chats[chatId].updated = Date.now();
+            saveChats();
+            renderHistory();
+        }
+
+    } catch (error) {
+        console.error('Image generation failed:', error);
+        showNotification('Network error. Please try again.', 'error');
+    } finally {
+        btn.innerHTML = originalText;
+        btn.disabled = false;
+    }
+});
+
+// Download image
+function downloadImage(dataUrl, filename) {
+    const link = document.createElement('a');
+    link.href = dataUrl;
+    link.download = `pcp_${filename}_${Date.now()}.jpg`;
+    link.click();
+}
+
+// Regenerate image
+function regenerateImage(prompt, model) {
+    document.getElementById('imagePrompt').value = prompt;
+    document.getElementById('imageModel').value = model;
+    document.getElementById('generateImageBtn').click();
+}
+
+// Enter key for image prompt
+document.getElementById('imagePrompt').addEventListener('keydown', (e) => {
+    if (e.key === 'Enter') {
+        e.preventDefault();
+        document.getElementById('generateImageBtn').click();
+    }
+});
+let uploadedText = ''; // stores extracted text
+
+// Document/OCR libraries are heavy, so they are only fetched once the upload flow needs them
+const LIBS = {
+    pdf: 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.246/pdf.min.js',
+    docx: 'https://cdnjs.cloudflare.com/ajax/libs/mammoth/1.4.2/mammoth.browser.min.js',
+    ocr: 'https://cdn.jsdelivr.net/npm/tesseract.js@4.1.1/dist/tesseract.min.js'
+};
+const LIB_FOR_EXT = { pdf: 'pdf', docx: 'docx', jpg: 'ocr', jpeg: 'ocr', png: 'ocr' };
+const loadedLibs = {};
+
+function loadLib(name){
+    if(!loadedLibs[name]){
+        loadedLibs[name] = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = LIBS[name];
+            script.async = true;
+            script.onload = resolve;
+            script.onerror = () => { delete loadedLibs[name]; reject(new Error('Failed to load ' + LIBS[name])); };
+            document.head.appendChild(script);
+        });
+    }
+    return loadedLibs[name];
+}
+
+function libForFile(file){
+    return LIB_FOR_EXT[file.name.split('.').pop().toLowerCase()];
+}
+
+// Update status when file selected, and start fetching the libraries the files will need
+document.getElementById('fileInput').addEventListener('change', () => {
+    const files = document.getElementById('fileInput').files;
+    if (files.length) {
+        document.getElementById('fileStatus').innerText = files.length + " file(s) selected: " + files[0].name;
+        for (const file of files) {
+            const lib = libForFile(file);
+            if (lib) loadLib(lib).catch(err => console.warn(err));
+        }
+    } else {
+        document.getElementById('fileStatus').innerText = "No file uploaded";
+    }
+});
+
+// Extract text when button clicked
+document.getElementById('extractBtn').addEventListener('click', async () => {
+    const files = document.getElementById('fileInput').files;
+    if (!files.length) return alert('Please select a file first!');
+
+    uploadedText = '';
+    document.getElementById('fileStatus').innerText = 'Extracting text...';
+
+    for (const file of files) {
+        const ext = file.name.split('.').pop().toLowerCase();
+        const lib = libForFile(file);
+        if (lib) {
+            try {
+                await loadLib(lib);
+            } catch (err) {
+                uploadedText += `Could not load reader for ${file.name}\n`;
+                continue;
+            }
+        }
+
+        if (ext === 'txt') {
+            uploadedText += await file.text() + '\n';
+        } 
+        else if (ext === 'pdf') {
+            const pdfjsLib = window['pdfjs-dist/build/pdf'];
+            pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.246/pdf.worker.min.js';
+            const arrayBuffer = await file.arrayBuffer();
+            const pdf = await pdfjsLib.getDocument({ data: arrayBuffer }).promise;
+            for (let i = 1; i <= pdf.numPages; i++) {
+                const page = await pdf.getPage(i);
+                const content = await page.getTextContent();
+                uploadedText += content.items.map(item => item.str).join(' ') + '\n';
+            }
+        } 
+        else if (ext === 'docx') {
+            const arrayBuffer = await file.arrayBuffer();
+            const result = await mammoth.extractRawText({ arrayBuffer });
+            uploadedText += result.value + '\n';
+        } 
+        else if (['jpg','jpeg','png'].includes(ext)) {
+            const reader = new FileReader();
+            reader.readAsDataURL(file);
+            await new Promise(resolve => {
+                reader.onload = async () => {
+                    const { data: { text } } = await Tesseract.recognize(reader.result, 'eng');
+                    uploadedText += text + '\n';
+                    resolve();
+                };
+            });
+        } 
+        else {
+            uploadedText += `Unsupported file type: ${file.name}\n`;
+        }
+    }
+
+    document.getElementById('fileStatus').innerText = 'Text extracted! You can now ask questions.';
+    console.log('Extracted text:', uploadedText); // you can feed this to your chat system
+});
+
+uploadedText = ''; // reset after answering if needed
+
@@ -0,0 +1,140 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import threading
+from flask import Response, request
+
+from asset_pipeline import build_css
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 512
+ASSET_URL = re.compile(r"\{\{\s*asset_url\('([^']+)'\)\s*\}\}")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class Asset:
+    """One static file with its content hash and precompressed variants"""
+    def __init__(self, name, body, content_type):
+        self.name = name
+        self.body = body
+        self.content_type = content_type
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {"identity": body}
+        if content_type.startswith(TEXT_TYPES) and len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding):
+        # Strong ETags must differ between encodings of the same resource
+        return self.version if encoding == "identity" else f"{self.version}-{encoding}"
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header that the client accepts (q > 0)"""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class AssetStore:
+    """Serves files from a directory, precompressed once at load, with strong ETags.
+
+    Assets are addressed as /assets/<version>/<name> so they can be cached as immutable;
+    HTML pages get their asset_url('...') placeholders rewritten to those URLs, and
+    stylesheets are purged of rules the pages don't use. Files are read and compressed on
+    the first request unless load() is called earlier.
+    """
+    def __init__(self, directory, url_prefix="/assets"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.assets = None
+        self.lock = threading.Lock()
+
+    def ensure_loaded(self):
+        if self.assets is None:
+            with self.lock:
+                if self.assets is None:
+                    self.load()
+        return self.assets
+
+    def load(self):
+        files = {}
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, self.directory).replace(os.sep, "/")] = f.read()
+        sources = [body.decode("utf-8") for name, body in files.items() if name.endswith((".html", ".js"))]
+
+        assets = {}
+        pages = []
+        for name, body in files.items():
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            if name.endswith(".html"):
+                pages.append((name, body, content_type))
+                continue
+            if name.endswith(".css"):
+                body = build_css(body.decode("utf-8"), sources).encode("utf-8")
+            assets[name] = Asset(name, body, content_type)
+        # Pages last, so they can reference the versioned URLs of everything else
+        for name, body, content_type in pages:
+            html = ASSET_URL.sub(lambda m: self._url(assets, m.group(1)), body.decode("utf-8"))
+            assets[name] = Asset(name, html.encode("utf-8"), content_type)
+        self.assets = assets
+        return self
+
+    def url(self, name):
+        return self._url(self.ensure_loaded(), name)
+
+    def _url(self, assets, name):
+        asset = assets.get(name)
+        if asset is None:
+            raise KeyError(f"Unknown static asset: {name}")
+        return f"{self.url_prefix}/{asset.version}/{name}"
+
+    def response(self, name, version=None):
+        """Serve an asset, negotiating encoding and answering conditional requests with 304.
+
+        Versioned requests for the current version are cached forever; unversioned ones
+        (and stale versions) must revalidate.
+        """
+        asset = self.ensure_loaded().get(name)
+        if asset is None:
+            return Response("Not found", status=404)
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        etag = asset.etag(encoding)
+        cache_control = IMMUTABLE if version == asset.version else REVALIDATE
+
+        if request.if_none_match.contains_weak(etag) or request.if_none_match.contains_weak(asset.etag("identity")):
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding], content_type=asset.content_type)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        if len(asset.variants) > 1:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1,355 @@
+import os
+import uuid
+import tempfile
+import threading
+from datetime import datetime
+from collections.abc import MutableMapping
+
+from app_logging import get_logger
+from json_codec import dumpb, loads
+from tracing import tracer
+
+STORAGE_MODES = ("auto", "supabase", "local")
+LOCAL_STORE_FILE = "local_store.json"
+# Columns that must be unique per table, as in the Supabase schema
+UNIQUE_COLUMNS = {"users": ("email", "username")}
+QUERY_ACTIONS = ("select", "insert", "update", "upsert", "delete")
+
+log = get_logger("storage")
+
+
+class LazyClient:
+    """Stands in for a client object and builds it on first use, so importing the app
+    doesn't pay for client libraries, connections or configuration checks"""
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LazyJsonFile(MutableMapping):
+    """A dict persisted as a JSON file, read on first access instead of at import.
+
+    Hold `lock` around changes that must not interleave with other threads, such as
+    iterating, or a change followed by save(); save() takes it too.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._lock = threading.Lock()
+        self.lock = threading.RLock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+        return self._data
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                data = loads(f.read())
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            log.error("json_file_load_failed", path=self.path, error=str(e))
+            return {}
+
+    def save(self):
+        # A temp file of its own per save, so concurrent writers (threads or processes)
+        # never write into each other's file; each replace is atomic
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self.lock:
+            tmp = tempfile.NamedTemporaryFile("wb", dir=directory, prefix=os.path.basename(self.path) + ".",
+                                              suffix=".tmp", delete=False)
+            try:
+                with tmp:
+                    # Compact: indentation made the file ~30% larger and slower to write on every save
+                    tmp.write(dumpb(self.data))
+                os.replace(tmp.name, self.path)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class LocalStoreError(Exception):
+    """Raised like a PostgREST APIError; code 23505 is a unique violation"""
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.details = message
+
+
+def storage_errors():
+    """Exception types a failed query can raise: the local store's and OS errors, plus
+    PostgREST's and the HTTP client's when supabase-py is installed. Meant for except clauses,
+    which only evaluate it once something is raised, so startup never imports them."""
+    global _storage_errors
+    if _storage_errors is None:
+        errors = [LocalStoreError, OSError]
+        try:
+            import httpx
+            from postgrest.exceptions import APIError
+            errors += [APIError, httpx.HTTPError]
+        except ImportError:
+            pass
+        _storage_errors = tuple(errors)
+    return _storage_errors
+
+
+_storage_errors = None
+
+
+class LocalResult:
+    def __init__(self, data):
+        self.data = data
+
+
+def _same(a, b):
+    return a == b or (a is not None and b is not None and str(a).lower() == str(b).lower())
+
+
+def _compare(a, b, op):
+    if a is None or b is None:
+        return False
+    try:
+        return a < b if op == "lt" else a > b
+    except TypeError:
+        return str(a) < str(b) if op == "lt" else str(a) > str(b)
+
+
+def _singular(table):
+    return table[:-1] if table.endswith("s") else table
+
+
+class LocalQuery:
+    """The part of the supabase-py query builder this app uses, over LocalClient's tables"""
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.values = None
+        self.filters = []
+        self.ordering = None
+        self.max_rows = None
+
+    def select(self, columns="*"):
+        self.action, self.columns = "select", columns
+        return self
+
+    def insert(self, values):
+        self.action, self.values = "insert", values
+        return self
+
+    def update(self, values):
+        self.action, self.values = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: _same(row.get(column), value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, "gt"))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: _compare(row.get(column), value, "lt"))
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda row: any(_same(row.get(column), v) for v in values))
+        return self
+
+    def or_(self, expression):
+        """PostgREST or filter, e.g. "expires_at.lt.2024-01-01,used.eq.true" """
+        tests = []
+        for part in expression.split(","):
+            column, op, value = part.split(".", 2)
+            if op == "eq":
+                tests.append(lambda row, c=column, v=value: _same(row.get(c), v))
+            else:
+                tests.append(lambda row, c=column, v=value, o=op: _compare(row.get(c), v, o))
+        self.filters.append(lambda row: any(test(row) for test in tests))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering = (column, desc)
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def execute(self):
+        with self.store.lock:
+            rows = self.store.tables.setdefault(self.table, [])
+            if self.action == "insert":
+                return LocalResult(self.store.insert(self.table, self.values))
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.ordering:
+                column, desc = self.ordering
+                matched.sort(key=lambda row: (row.get(column) is None, str(row.get(column))), reverse=desc)
+            if self.max_rows is not None:
+                matched = matched[:self.max_rows]
+            if self.action == "update":
+                for row in matched:
+                    row.update(self.values)
+                self.store.save()
+                return LocalResult([dict(row) for row in matched])
+            if self.action == "delete":
+                ids = {id(row) for row in matched}
+                self.store.tables[self.table] = [row for row in rows if id(row) not in ids]
+                self.store.save()
+                return LocalResult(matched)
+            return LocalResult([self.store.project(self.table, row, self.columns) for row in matched])
+
+
+class LocalClient:
+    """Supabase stand-in that keeps every table in one JSON file.
+
+    Used in local-only mode (no Supabase configured or reachable): it understands the
+    select/insert/update/delete calls and filters the app makes, including one level of
+    embedded resources such as "*, users(*)", and enforces the unique user columns.
+    """
+    def __init__(self, path=LOCAL_STORE_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.tables = LazyJsonFile(path)
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def insert(self, table, values):
+        rows = self.tables.setdefault(table, [])
+        new_rows = [dict(v) for v in (values if isinstance(values, list) else [values])]
+        for row in new_rows:
+            for column in UNIQUE_COLUMNS.get(table, ()):
+                if row.get(column) is not None and any(_same(r.get(column), row[column]) for r in rows):
+                    raise LocalStoreError(
+                        f'duplicate key value violates unique constraint "{table}_{column}_key"', code="23505")
+            row.setdefault("id", uuid.uuid4().hex)
+            row.setdefault("created_at", datetime.utcnow().isoformat())
+            rows.append(row)
+        self.save()
+        return [dict(row) for row in new_rows]
+
+    def project(self, table, row, columns):
+        out = {}
+        for column in (c.strip() for c in columns.split(",")):
+            if column == "*":
+                out.update(row)
+            elif column.endswith("(*)"):
+                out[column[:-3]] = self.embed(table, row, column[:-3])
+            elif column:
+                out[column] = row.get(column)
+        return out
+
+    def embed(self, table, row, other):
+        """Related rows: the one `row` points at (row.user_id -> users) or those pointing at it"""
+        foreign_key = _singular(other) + "_id"
+        if foreign_key in row:
+            return next((dict(r) for r in self.tables.get(other, []) if _same(r.get("id"), row[foreign_key])), None)
+        back_key = _singular(table) + "_id"
+        return [dict(r) for r in self.tables.get(other, []) if _same(r.get(back_key), row.get("id"))]
+
+    def save(self):
+        try:
+            self.tables.save()
+        except Exception as e:
+            log.error("local_store_save_failed", path=self.path, error=str(e))
+
+
+class TracedQuery:
+    """Passes a query builder through, timing execute() as a "supabase" span"""
+    def __init__(self, query, table, action="select"):
+        self._query = query
+        self._table = table
+        self._action = action
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            return TracedQuery(result, self._table, name if name in QUERY_ACTIONS else self._action)
+        return call
+
+    def execute(self):
+        with tracer.span("supabase", table=self._table, action=self._action) as span:
+            result = self._query.execute()
+            span.set(rows=len(result.data) if isinstance(result.data, list) else None)
+            return result
+
+
+class TracedClient:
+    """A storage client whose table queries are recorded as tracing spans"""
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return TracedQuery(self._client.table(name), name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def create_storage_client(url, key, mode="auto", local_path=LOCAL_STORE_FILE):
+    """Supabase client, or the local store in local-only mode.
+
+    "auto" uses Supabase when credentials are set and the local store when they are not;
+    "supabase" and "local" force one. With credentials set, a client that can't be created is
+    an error in either mode: falling back would send production writes to a local file.
+    """
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"STORAGE_MODE must be one of {', '.join(STORAGE_MODES)}, not {mode!r}")
+    if mode == "local" or (mode == "auto" and not (url and key)):
+        log.info("storage_local_only", path=local_path)
+        return LocalClient(local_path)
+    try:
+        from supabase import create_client  # heavy import, deferred until the first query
+        client = create_client(url, key)
+    except Exception as e:
+        log.error("storage_supabase_failed", error=str(e))
+        raise
+    log.info("storage_supabase_ready")
+    return client
@@ -0,0 +1,275 @@
+import os
+import time
+import queue
+import atexit
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from json_codec import dumps
+
+# Where finished spans go: "" (nowhere), "file:<path>" for JSON lines, or an http(s) URL
+# that accepts POSTed JSON arrays of spans (a local collector)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 10000))
+EXPORT_BATCH = 500
+
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class Span:
+    """One timed operation within a trace"""
+    __slots__ = ("name", "span_id", "parent_id", "started", "wall", "duration", "attrs")
+
+    def __init__(self, name, parent_id, attrs):
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.wall = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, trace_id):
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.wall, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    """The spans of one request, or of one piece of background work"""
+    def __init__(self, trace_id=None, parent_id=None, sampled=True):
+        self.trace_id = trace_id or _new_id(16)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.spans = []
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def breakdown(self):
+        """{span name: (total ms, count)} over the finished spans below the root"""
+        totals = {}
+        for span in self.spans[1:]:
+            if span.duration is None:
+                continue
+            ms, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (ms + span.duration * 1000, count + 1)
+        return {name: (round(ms, 1), count) for name, (ms, count) in totals.items()}
+
+    def server_timing(self):
+        """Server-Timing header value: time per operation plus the request total"""
+        parts = [f'{name};dur={ms};desc="{count}x"' for name, (ms, count) in self.breakdown().items()]
+        parts.append(f"total;dur={round(self.elapsed() * 1000, 1)}")
+        return ", ".join(parts)
+
+
+class SpanExporter:
+    """Writes finished spans from a background thread; drops (and counts) them when the
+    queue is full so exporting never slows a request down"""
+    def __init__(self, target=TRACE_EXPORT, queue_size=TRACE_QUEUE_SIZE):
+        self.target = target
+        self.queue = queue.Queue(queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return bool(self.target)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self.thread.start()
+                atexit.register(self.stop)
+
+    def export(self, spans):
+        self.start()
+        for span in spans:
+            try:
+                self.queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def stop(self):
+        """Flush queued spans and stop the thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch = [] if item is None else [item]
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+            if item is None:
+                return
+
+    def _write(self, batch):
+        try:
+            if self.target.startswith(("http://", "https://")):
+                import requests
+                requests.post(self.target, json=batch, timeout=5).raise_for_status()
+            else:
+                path = self.target[len("file:"):] if self.target.startswith("file:") else self.target
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(dumps(span, default=str) + "\n" for span in batch))
+            self.exported += len(batch)
+        except Exception:
+            self.failed += len(batch)
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class Tracer:
+    """Lightweight spans for requests and the storage/upstream calls they make.
+
+    A trace is bound to the current context (thread) by start_trace(); span() nests under
+    whatever span is open. A span opened outside any trace starts its own, so background
+    work (message flushes, janitor sweeps) is still recorded.
+    """
+    def __init__(self, exporter=None, sample_rate=TRACE_SAMPLE_RATE):
+        self.exporter = exporter or SpanExporter()
+        self.sample_rate = sample_rate
+
+    def start_trace(self, traceparent=None, name="request", **attrs):
+        """Begin a trace for the current request, continuing the caller's trace if given"""
+        parent = parse_traceparent(traceparent)
+        if parent:
+            trace = Trace(*parent)
+        else:
+            trace = Trace(sampled=self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+        root = Span(name, trace.parent_id, attrs)
+        trace.spans.append(root)
+        _trace.set(trace)
+        _parent.set(root.span_id)
+        return trace
+
+    def end_trace(self, **attrs):
+        """Close the current trace's root span, export it and unbind it"""
+        trace = _trace.get()
+        if trace is None:
+            return None
+        root = trace.spans[0]
+        root.duration = time.perf_counter() - root.started
+        root.attrs.update(attrs)
+        _trace.set(None)
+        _parent.set(None)
+        self._export(trace)
+        return trace
+
+    def _export(self, trace):
+        if trace.sampled and self.exporter.enabled:
+            self.exporter.export([s.to_dict(trace.trace_id) for s in trace.spans if s.duration is not None])
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as a child of the current span"""
+        trace = _trace.get()
+        if trace is None:
+            with self._background(name, attrs) as span:
+                yield span
+            return
+        span = Span(name, _parent.get(), attrs)
+        trace.spans.append(span)
+        token = _parent.set(span.span_id)
+        try:
+            yield span
+        except Exception as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.started
+            _parent.reset(token)
+
+    @contextmanager
+    def _background(self, name, attrs):
+        trace = self.start_trace(name=name, **attrs)
+        try:
+            yield trace.spans[0]
+        except Exception as e:
+            trace.spans[0].attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.end_trace()
+
+    def traced(self, name):
+        """Decorator form of span()"""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorator
+
+    def current_trace_id(self):
+        trace = _trace.get()
+        return trace.trace_id if trace else None
+
+    def inject(self, headers):
+        """Add a traceparent header for an outgoing call so the callee can join the trace"""
+        trace = _trace.get()
+        if trace is not None:
+            headers["traceparent"] = f"00-{trace.trace_id}-{_parent.get()}-{'01' if trace.sampled else '00'}"
+        return headers
+
+    def stats(self):
+        return self.exporter.stats()
+
+
+# Create global instance
+
+tracer = Tracer()